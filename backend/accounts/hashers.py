@@ -0,0 +1,162 @@
+"""
+Password hashing off the request workers.
+
+PBKDF2 and argon2 are CPU-bound by design, so a burst of logins run
+inline pins every worker and starves the cheap endpoints. Hashes are
+computed on a small process pool instead, and a request that would have
+to queue behind PASSWORD_HASH_MAX_PENDING others gets HashingBusy (a 503)
+right away rather than waiting.
+
+The hasher classes below read their cost from settings, so raising it
+(or switching PASSWORD_HASHER) upgrades each stored hash the next time
+its owner logs in.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class HashingBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_PENDING hashes are already in flight."""
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Needs argon2-cffi (pip install django[argon2])."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+def _setup_worker():
+    # Workers are spawned, not forked from a threaded server, so they
+    # configure Django themselves; they never touch the database.
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "source.settings")
+    import django
+    django.setup()
+
+
+class HashPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def _start(self):
+        with self._lock:
+            if self._slots is None:
+                if settings.PASSWORD_HASH_WORKERS:
+                    self._executor = self._new_executor()
+                self._slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+    @staticmethod
+    def _new_executor():
+        return ProcessPoolExecutor(settings.PASSWORD_HASH_WORKERS, get_context("spawn"), _setup_worker)
+
+    def _replace(self, broken):
+        # Only the first thread to notice replaces it; the others retry on
+        # the new pool.
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False)
+                self._executor = self._new_executor()
+
+    def run(self, func, *args):
+        """
+        Runs func(*args) on the pool, or inline when PASSWORD_HASH_WORKERS is 0.
+        A worker that dies (OOM kill, segfault) breaks the whole executor, so
+        it is replaced and the call retried once; if that fails too, the
+        caller gets HashingBusy rather than an error for every later login.
+        """
+        if self._slots is None:
+            self._start()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise HashingBusy("Too many password checks in progress; retry shortly.")
+        try:
+            for retry in (False, True):
+                executor = self._executor
+                if executor is None:
+                    return func(*args)
+                try:
+                    return executor.submit(func, *args).result()
+                except BrokenProcessPool as e:
+                    self._replace(executor)
+                    if retry:
+                        raise HashingBusy("Password hashing is unavailable; retry shortly.") from e
+        finally:
+            slots.release()
+
+    def reset(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = self._slots = None
+
+
+pool = HashPool()
+
+
+@receiver(setting_changed)
+def reset_pool(*, setting, **kwargs):
+    # Workers keep the settings they started with, so tests that override
+    # hashing settings get a fresh pool.
+    if setting.startswith("PASSWORD_"):
+        pool.reset()
+
+
+def _verify(raw, encoded):
+    return hashers.check_password(raw, encoded)
+
+
+def hash_password(raw):
+    """make_password() on the pool. None gives an unusable password, inline."""
+    if raw is None:
+        return hashers.make_password(None)
+    return pool.run(hashers.make_password, raw)
+
+
+def needs_rehash(encoded):
+    """Whether `encoded` was made by another hasher, or with other parameters."""
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = hashers.get_hasher("default")
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def verify_password(user, raw):
+    """
+    user.check_password(raw) on the pool. On success, a hash made with
+    outdated parameters is replaced on `user` (not saved) and True is
+    returned as the second item so the caller can save it.
+    """
+    if not raw or not hashers.is_password_usable(user.password):
+        return False, False
+    if not pool.run(_verify, raw, user.password):
+        return False, False
+    if not needs_rehash(user.password):
+        return True, False
+    user.password = hash_password(raw)
+    return True, True
@@ -0,0 +1,44 @@
+import time
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from source.jwt_middleware import CustomAuthBackend
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Measures CustomAuthBackend logins per second and queries per login."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=50, help="Logins per identifier kind.")
+        parser.add_argument("--users", type=int, default=10_000, help="Users seeded (and rolled back) first.")
+
+    def handle(self, *args, **options):
+        password = "bench-login-password"
+        backend = CustomAuthBackend()
+        with transaction.atomic():
+            encoded = make_password(password)
+            User.objects.bulk_create(
+                (
+                    User(username=f"bench_login_{i}", email=f"bench_login_{i}@example.com", password=encoded,
+                         is_active=True)
+                    for i in range(options["users"])
+                ),
+                batch_size=2000,
+            )
+            target = options["users"] // 2
+            for kind, identifier in (("username", f"bench_login_{target}"), ("email", f"bench_login_{target}@example.com")):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    for _ in range(options["logins"]):
+                        backend.authenticate(username=identifier, password=password)
+                    elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"{kind:<8} {options['logins'] / elapsed:8.1f} logins/s "
+                    f"{elapsed / options['logins'] * 1000:7.1f}ms/login "
+                    f"{len(queries) / options['logins']:.1f} queries/login"
+                )
+            transaction.set_rollback(True)
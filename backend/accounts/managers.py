@@ -3,6 +3,7 @@ from django.utils import timezone
 from django.db import models
 from django.contrib.auth.models import BaseUserManager
 from django.apps import apps
+from accounts.hashers import hash_password
 from accounts.querysets import UserQuerySet, OtpQuerySet
 import random
 from accounts.utils import check_email, is_valid_phone_number
@@ -14,7 +15,7 @@ class UserManager(BaseUserManager):
     """Custom manager for User model."""
 
     def get_queryset(self):
-        return UserQuerySet(self.model, using="default")
+        return UserQuerySet(self.model, using=self._db)
 
     def create_user(self, username, email, phone_no=None, password=None, referrer_user=None, **extra_fields):
         """
@@ -63,9 +64,9 @@ class UserManager(BaseUserManager):
             phone_no=phone_no,
             referrer_user=referrer_user,
         )
-        user.set_password(password)
+        user.password = hash_password(password)
         user.is_active = True
-        user.save(using="default")
+        user.save(using=self._db)
         
         return user
 
@@ -74,7 +75,7 @@ class UserManager(BaseUserManager):
         user = self.create_user(username=username, email=email, password=password, **extra_fields)
         user.is_active = True
         user.staff = True
-        user.save(using="default")
+        user.save(using=self._db)
         return user
 
     def create_superuser(self, username, email, password=None, **extra_fields):
@@ -83,12 +84,12 @@ class UserManager(BaseUserManager):
         user.is_active = True
         user.staff = True
         user.admin = True
-        user.save(using="default")
+        user.save(using=self._db)
         return user
 
     def custom_save(self, obj):
-        """Save using the default database."""
-        obj.save(using="default")
+        """Save through the database router (or the manager's db_manager() alias)."""
+        obj.save(using=self._db)
         return obj
 
     # Utility functions
@@ -103,6 +104,9 @@ class UserManager(BaseUserManager):
 
     def get_user_by_email(self,email):
         return self.get_queryset().get_user_by_email(email)
+
+    def get_user_for_login(self,identifier):
+        return self.get_queryset().get_user_for_login(identifier)
     
     def get_user_by_phone_no(self,phone_no):
         return self.get_queryset().get_user_by_phone_no(phone_no)
@@ -115,7 +119,7 @@ class OtpManager(models.Manager):
     """Manager for handling OTP creation and validation."""
 
     def get_queryset(self):
-        return OtpQuerySet(self.model, using="default")
+        return OtpQuerySet(self.model, using=self._db)
 
     def create(self, email, purpose, ttl=None, otp=None):
         """
@@ -139,7 +143,7 @@ class OtpManager(models.Manager):
             purpose=purpose,
             ttl=ttl,
         )
-        otp_instance.save(using="default")
+        otp_instance.save(using=self._db)
         return otp_instance
 
     def generate_otp(self, length=6):
@@ -173,6 +177,6 @@ class OtpManager(models.Manager):
     
     
     def custom_save(self, obj):
-        """Save using the default database."""
-        obj.save(using="default")
+        """Save through the database router (or the manager's db_manager() alias)."""
+        obj.save(using=self._db)
         return obj
@@ -44,6 +44,8 @@ class CustomUser(AbstractBaseUser):
     referrer_user = models.CharField(_("referrer_user"), max_length=50,null=True,blank=True)
 
     is_remove = models.BooleanField(_("Remove"), default=False)
+    # Maintained by the posts app on create/delete so profiles never COUNT(*).
+    post_count = models.PositiveIntegerField(_("post count"), default=0)
     last_login = models.DateTimeField(_('last login'), blank=True, null=True)
     create_time = models.DateTimeField(_("Created Time"), default = timezone.now)
     update_time = models.DateTimeField(_("Updated Time"), default = timezone.now)
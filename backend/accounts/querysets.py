@@ -30,6 +30,15 @@ class UserQuerySet(models.QuerySet):
         except IndexError:
             return None
 
+    def get_user_for_login(self, identifier):
+        # One query over both unique indexes. A username may look like
+        # someone else's email, in which case the username wins.
+        users = list(self.filter(models.Q(username=identifier) | models.Q(email=identifier))[:2])
+        for user in users:
+            if user.username == identifier:
+                return user
+        return users[0] if users else None
+
     def get_user_by_phone_no(self, phone_no):
         try:
             return self.filter(phone_no=phone_no, is_active=True, is_remove=False)[0]
@@ -1,7 +1,19 @@
+import os
+import time
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, APITestCase
 from django.contrib.auth import get_user_model
+from django_redis import get_redis_connection
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from accounts.hashers import HashingBusy, pool
+from source.authentication import JWTClaimsAuthentication, verified_tokens
+from source.jwt_middleware import REVOKED_KEY
 
 User = get_user_model()
 
@@ -29,4 +41,111 @@ class UserAuthTests(APITestCase):
         response = self.client.post(url, payload, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("access", response.data)
-        self.assertIn("refresh", response.data)
\ No newline at end of file
+        self.assertIn("refresh", response.data)
+
+    def test_login_uses_one_lookup_and_writes_only_last_login(self):
+        user = User.objects.create_user(
+            username="hamza",
+            email="hamza@gmail.com",
+            password="ppoopp00"
+        )
+        url = reverse("login")
+        for identifier in ("hamza", "HAMZA@gmail.com"):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {"username": identifier, "password": "ppoopp00"}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # One SELECT for the user, one UPDATE of last_login.
+            self.assertEqual(len(queries), 2)
+            update = queries.captured_queries[-1]["sql"]
+            self.assertTrue(update.startswith("UPDATE"))
+            self.assertIn('"last_login"', update)
+            self.assertNotIn('"password"', update)
+        user.refresh_from_db()
+        self.assertIsNotNone(user.last_login)
+
+        response = self.client.post(url, {"username": "nobody", "password": "ppoopp00"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PASSWORD_HASH_WORKERS=0)
+    def test_login_rehashes_outdated_passwords(self):
+        user = User.objects.create_user(username="hamza", email="hamza@gmail.com", password="ppoopp00")
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse("login"), {"username": "hamza", "password": "ppoopp00"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(user.check_password("ppoopp00"))
+
+    def test_login_is_shed_when_hashing_is_saturated(self):
+        User.objects.create_user(username="hamza", email="hamza@gmail.com", password="ppoopp00")
+        with override_settings(PASSWORD_HASH_MAX_PENDING=0):
+            response = self.client.post(reverse("login"), {"username": "hamza", "password": "ppoopp00"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+
+    @override_settings(PASSWORD_HASH_WORKERS=1)
+    def test_hash_pool_survives_a_dead_worker(self):
+        # The worker exits on every attempt: the call gives up with a 503...
+        with self.assertRaises(HashingBusy):
+            pool.run(os._exit, 1)
+        # ...and the broken executor has been replaced for the next one.
+        self.assertEqual(pool.run(abs, -1), 1)
+
+    def test_jwt_authentication_builds_the_user_from_claims(self):
+        User.objects.create_superuser(username="admin", email="admin@gmail.com", password="ppoopp00")
+        response = self.client.post(reverse("login"), {"username": "admin", "password": "ppoopp00"}, format="json")
+        self.client.credentials(HTTP_AUTHORIZATION=f"JWT {response.data['access']}")
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"JWT {response.data['access']}")
+
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                user, token = JWTClaimsAuthentication().authenticate(request)
+            self.assertEqual(len(queries), 0)
+            self.assertEqual((user.username, user.is_admin, user.is_staff), ("admin", True, True))
+        self.assertIs(verified_tokens.get(token.token), token)
+        # Anything the claims do not carry loads the row, once.
+        with self.assertNumQueries(1):
+            self.assertEqual((user.email, user.post_count), ("admin@gmail.com", 0))
+
+        # IsAdminUser passes on the is_staff claim.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("posts:posts-export"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any("platform_user" in q["sql"] for q in queries.captured_queries))
+
+        # A deleted user's still valid token fails authentication instead of a 500.
+        User.objects.filter(username="admin").delete()
+        user, _ = JWTClaimsAuthentication().authenticate(request)
+        with self.assertRaises(AuthenticationFailed):
+            user.email
+
+        self.client.credentials(HTTP_AUTHORIZATION="JWT not-a-token")
+        self.assertEqual(self.client.get(reverse("posts:posts-export")).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotates_and_revokes_the_used_token(self):
+        User.objects.create_user(username="hamza", email="hamza@gmail.com", password="ppoopp00")
+        tokens = self.client.post(reverse("login"), {"username": "hamza", "password": "ppoopp00"}, format="json").data
+        self.assertNotEqual(tokens["access"], tokens["refresh"])
+        access = AccessToken(tokens["access"])
+        self.assertLessEqual(access["exp"] - access["iat"], settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"].total_seconds())
+        self.assertEqual(access["username"], "hamza")
+
+        url = reverse("token-refresh")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)  # the user, for fresh claims
+        self.assertNotEqual(response.data["refresh"], tokens["refresh"])
+        self.assertEqual(AccessToken(response.data["access"])["username"], "hamza")
+
+        old = RefreshToken(tokens["refresh"])
+        ttl = get_redis_connection("default").ttl(REVOKED_KEY.format(old["jti"]))
+        self.assertAlmostEqual(ttl, old["exp"] - time.time(), delta=5)
+        # A used refresh token is rejected without touching the database.
+        with self.assertNumQueries(0):
+            response = self.client.post(url, {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(url, {"refresh": tokens["access"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,8 +1,10 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from accounts import serializers
+from accounts.hashers import HashingBusy
 from accounts.models import Otp
 from accounts.utils import custom_send_email
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -51,6 +53,12 @@ class CreateUserAPIView(generics.CreateAPIView):
                     status=status.HTTP_201_CREATED
                 )
 
+        except HashingBusy as e:
+            return Response(
+                {"message": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER)},
+            )
         except Exception as e:
             return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
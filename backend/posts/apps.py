@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        from posts.metrics import install_query_timer
+        from posts.models import Post
+        from posts.signals import post_deleted, post_saved
+        post_save.connect(post_saved, sender=Post, dispatch_uid="posts_post_saved")
+        post_delete.connect(post_deleted, sender=Post, dispatch_uid="posts_post_deleted")
+        connection_created.connect(install_query_timer, dispatch_uid="posts_install_query_timer")
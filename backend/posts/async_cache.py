@@ -0,0 +1,162 @@
+import asyncio
+import time
+import uuid
+import weakref
+from django.conf import settings
+from django.core.cache import cache as remote_cache
+from redis import asyncio as aioredis
+from source.db_router import use_primary
+from .cache import LIST_VERSION_KEY, POST_VERSION_TIMEOUT, bumped_key, page_key, post_key, post_version_key
+from .metrics import record_cache
+
+# redis.asyncio pools are bound to the event loop that created them; keep
+# one per loop (in practice, one per ASGI worker process).
+_pools = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = aioredis.ConnectionPool.from_url(
+            settings.CACHES["default"]["LOCATION"],
+            max_connections=settings.POSTS_ASYNC_REDIS_MAX_CONNECTIONS,
+        )
+        _pools[loop] = pool
+    return aioredis.Redis(connection_pool=pool)
+
+
+# Keys and values are read and written in django_redis' format, so the
+# sync and async views share one cache.
+
+def _key(key):
+    return str(remote_cache.client.make_key(key))
+
+
+def _decode(raw):
+    return None if raw is None else remote_cache.client.decode(raw)
+
+
+def _encode(value):
+    return remote_cache.client.encode(value)
+
+
+async def _version(client, key, timeout=None):
+    version = _decode(await client.get(_key(key)))
+    if version is None:
+        # Same clock seeding as posts.cache._version.
+        await client.set(_key(key), int(time.time() * 1000), nx=True, ex=timeout)
+        version = _decode(await client.get(_key(key)))
+    return version
+
+
+async def list_version():
+    return await _version(get_client(), LIST_VERSION_KEY)
+
+
+async def peek_post_version(pk):
+    return _decode(await get_client().get(_key(post_version_key(pk))))
+
+
+async def _get_entry(client, key, version_key):
+    """(entry, version, primary) in one MGET; see posts.cache.bumped_key."""
+    keys = [_key(key), _key(version_key)]
+    if settings.DATABASE_REPLICAS:
+        keys.append(_key(bumped_key(version_key)))
+    raw = await client.mget(keys)
+    return _decode(raw[0]), _decode(raw[1]), len(raw) > 2 and raw[2] is not None
+
+
+async def get_page(cursor, page_size, build, fields=None):
+    client = get_client()
+    key = page_key(cursor, page_size, fields)
+    entry, version, primary = await _get_entry(client, key, LIST_VERSION_KEY)
+    if version is None:
+        version = await _version(client, LIST_VERSION_KEY)
+    return await read_through(client, key, build, entry, version, primary=primary)
+
+
+async def get_post(pk, build, fields=None):
+    """Like posts.cache.get_post, the version key is only created for posts that exist."""
+    client = get_client()
+    key, version_key = post_key(pk, fields), post_version_key(pk)
+    entry, version, primary = await _get_entry(client, key, version_key)
+
+    async def seed_version():
+        pipeline = client.pipeline(transaction=False)
+        pipeline.set(_key(version_key), int(time.time() * 1000), nx=True, ex=POST_VERSION_TIMEOUT)
+        pipeline.get(_key(version_key))
+        return _decode((await pipeline.execute())[1])
+
+    return await read_through(client, key, build, entry, version, seed_version, primary)
+
+
+async def read_through(client, key, build, entry, version, seed_version=None, primary=False):
+    """
+    Async counterpart of posts.cache.read_through: same envelopes, same
+    rebuild lock, same negative caching. `build` and `seed_version` are
+    coroutine functions.
+    """
+    if primary:
+        build = _on_primary(build)
+    if entry is not None:
+        if entry["fresh_until"] > time.time() and entry["version"] == version:
+            record_cache("hits", key)
+            return entry["value"], entry["version"]
+        token = await _acquire_lock(client, key)
+        if token is None:
+            record_cache("hits", key)
+            return entry["value"], entry["version"]
+        record_cache("misses", key)
+        return await _rebuild(client, key, build, version, token, seed_version)
+
+    record_cache("misses", key)
+    token = await _acquire_lock(client, key)
+    if token is not None:
+        return await _rebuild(client, key, build, version, token, seed_version)
+
+    deadline = time.time() + settings.POSTS_CACHE_LOCK_WAIT
+    while time.time() < deadline:
+        await asyncio.sleep(0.02)
+        entry = _decode(await client.get(_key(key)))
+        if entry is not None:
+            return entry["value"], entry["version"]
+    value = await build()
+    if value is not None and version is None and seed_version is not None:
+        version = await seed_version()
+    return value, version
+
+
+async def _rebuild(client, key, build, version, token, seed_version=None):
+    try:
+        value = await build()
+        if value is not None and version is None and seed_version is not None:
+            version = await seed_version()
+        ttl = settings.POSTS_CACHE_TTL if value is not None else settings.POSTS_CACHE_NEGATIVE_TTL
+        entry = {"value": value, "fresh_until": time.time() + ttl, "version": version}
+        await client.set(_key(key), _encode(entry), ex=ttl + settings.POSTS_CACHE_GRACE)
+        record_cache("sets", key)
+        return value, version
+    finally:
+        await _release_lock(client, key, token)
+
+
+def _on_primary(build):
+    # The ContextVar set here is copied into the sync_to_async threads
+    # that run the ORM queries.
+    async def build_on_primary():
+        with use_primary():
+            return await build()
+    return build_on_primary
+
+
+async def _acquire_lock(client, key):
+    token = uuid.uuid4().hex
+    if await client.set(_key(f"lock:{key}"), _encode(token), nx=True, ex=settings.POSTS_CACHE_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+async def _release_lock(client, key, token):
+    if _decode(await client.get(_key(f"lock:{key}"))) == token:
+        await client.delete(_key(f"lock:{key}"))
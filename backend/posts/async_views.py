@@ -0,0 +1,103 @@
+"""
+Native async versions of posts_list (GET) and post_detail for ASGI.
+
+They share cache keys, envelopes and versions with the sync views. Only
+the Redis I/O is natively async, through a pooled redis.asyncio client;
+Django 4.2's async ORM still runs each query via sync_to_async on a
+thread, so cache misses occupy one for the length of the query.
+"""
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from . import async_cache, stream
+from .models import Post
+from .pagination import InvalidCursor, get_page_size, keyset, split_page
+from .rendering import not_modified, prepare, respond_raw, set_etag
+from .serializers import LIST_FIELDS, InvalidFields, parse_fields, post_rows, serialize_rows
+from .view_counts import arecord_view
+
+
+async def posts_list(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    try:
+        fields = parse_fields(request.GET.get("fields"), default=LIST_FIELDS)
+        page_size = get_page_size(request.GET.get("page_size"))
+    except (InvalidCursor, InvalidFields) as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+
+    if request.META.get("HTTP_IF_NONE_MATCH"):
+        response = not_modified(request, f"posts-{await async_cache.list_version()}")
+        if response is not None:
+            return response
+
+    cursor = request.GET.get("cursor", "")
+
+    async def build_page():
+        queryset = keyset(post_rows(Post.objects.all(), fields), cursor, page_size)
+        rows, next_cursor = split_page([row async for row in queryset], page_size)
+        return prepare({"next": next_cursor, "results": serialize_rows(rows, fields)})
+
+    try:
+        page, version = await async_cache.get_page(cursor, page_size, build_page, fields)
+    except InvalidCursor as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    return set_etag(respond_raw(request, page, 200), f"posts-{version}")
+
+
+async def post_detail(request, pk):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    try:
+        fields = parse_fields(request.GET.get("fields"))
+    except InvalidFields as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+
+    # See posts.views.post_detail.
+    if request.META.get("HTTP_IF_NONE_MATCH"):
+        version = await async_cache.peek_post_version(pk)
+        response = not_modified(request, f"post-{pk}-{version}", wildcard=False) if version is not None else None
+        if response is not None:
+            await arecord_view(async_cache.get_client(), pk)
+            return response
+
+    async def build_post():
+        try:
+            row = await post_rows(Post.objects.all(), fields).aget(pk=pk)
+        except Post.DoesNotExist:
+            return None
+        return prepare(serialize_rows([row], fields)[0])
+
+    data, version = await async_cache.get_post(pk, build_post, fields)
+    if data is None:
+        return JsonResponse({"detail": "Post not found"}, status=404)
+    await arecord_view(async_cache.get_client(), pk)
+    response = not_modified(request, f"post-{pk}-{version}")
+    if response is not None:
+        return response
+    return set_etag(respond_raw(request, data, 200), f"post-{pk}-{version}")
+
+
+async def posts_stream(request):
+    """
+    GET v1/api/posts/stream: Server-Sent Events for every new post. Send
+    Last-Event-ID (or ?last_event_id= on the first connect) to get the
+    posts created since then first.
+
+    Only works under ASGI (uvicorn source.asgi:application). WSGI servers,
+    runserver included, would buffer the whole stream and send nothing
+    until it ends, so such requests get a 501 instead.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "The posts stream needs an ASGI server."}, status=501)
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return JsonResponse({"detail": "Invalid Last-Event-ID."}, status=400)
+    response = StreamingHttpResponse(stream.events(last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keeps nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,84 @@
+import os
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django_redis import get_redis_connection
+
+
+class LocalBroker:
+    """
+    In-memory publish/subscribe for tests and single-process setups.
+    Messages are delivered synchronously to every subscriber.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = defaultdict(list)
+
+    def publish(self, channel, message):
+        with self._lock:
+            callbacks = list(self._callbacks[channel])
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._callbacks[channel].append(callback)
+
+
+class RedisBroker:
+    """
+    Redis pub/sub. Each process holds a single subscriber connection, read
+    by one daemon thread that fans messages out to the local callbacks.
+    """
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._callbacks = defaultdict(list)
+        self._pubsub = None
+        self._thread = None
+
+    def publish(self, channel, message):
+        get_redis_connection(self.alias).publish(channel, message)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive a fork; start over in the child.
+                self._reset()
+            first = channel not in self._callbacks
+            self._callbacks[channel].append(callback)
+            if self._pubsub is None:
+                self._pubsub = get_redis_connection(self.alias).pubsub(ignore_subscribe_messages=True)
+            if first:
+                self._pubsub.subscribe(**{channel: self._dispatch})
+            if self._thread is None:
+                self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _dispatch(self, message):
+        data = message["data"]
+        if isinstance(data, bytes):
+            data = data.decode()
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        for callback in list(self._callbacks[channel]):
+            callback(data)
+
+
+_brokers = {}
+
+
+def get_broker():
+    """
+    Returns the process-wide broker selected by POSTS_BROKER.
+    """
+    kind = settings.POSTS_BROKER
+    if kind not in _brokers:
+        _brokers[kind] = LocalBroker() if kind == "local" else RedisBroker()
+    return _brokers[kind]
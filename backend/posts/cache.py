@@ -0,0 +1,318 @@
+import hashlib
+import time
+import uuid
+from contextlib import nullcontext
+from django.conf import settings
+from django.core.cache import cache as remote_cache
+from source.db_router import use_primary
+from .broker import get_broker
+from .local_cache import TieredCache
+from .metrics import record_cache
+
+LIST_VERSION_KEY = "posts:version"
+# Per-post version keys may expire: a reseed from the clock is still larger
+# than any value the old counter reached.
+POST_VERSION_TIMEOUT = 24 * 60 * 60
+
+# All posts cache traffic goes through here; with POSTS_LOCAL_CACHE_ENABLED
+# on, hot keys are served from process memory before asking Redis.
+cache = TieredCache(remote_cache, get_broker)
+
+
+def _fields_tag(fields):
+    return ",".join(fields) if fields else "all"
+
+
+def post_key(pk, fields=None):
+    if fields:
+        return f"post:{pk}:fields:{_fields_tag(fields)}"
+    return f"post:{pk}"
+
+
+def page_key(cursor, page_size, fields=None):
+    return f"posts:page:{_fields_tag(fields)}:{cursor or 'first'}:{page_size}"
+
+
+def user_page_key(user_id, cursor, page_size):
+    return f"posts:user:{user_id}:{cursor or 'first'}:{page_size}"
+
+
+def search_key(match, cursor, page_size):
+    digest = hashlib.sha1(match.encode()).hexdigest()
+    return f"posts:search:{digest}:{cursor or 'first'}:{page_size}"
+
+
+def post_version_key(pk):
+    return f"post:{pk}:version"
+
+
+def bumped_key(version_key):
+    """
+    Set for DATABASE_REPLICA_PIN_SECONDS after `version_key` is bumped.
+    While it exists, rebuilds read from the primary: a replica may not have
+    the write yet, and what they cache under the new version is what the
+    writer's pinned requests get served.
+    """
+    return f"{version_key}:bumped"
+
+
+def _with_bumped(keys, version_key):
+    # Only worth a key in the get_many when reads can go to a replica.
+    if settings.DATABASE_REPLICAS:
+        return [*keys, bumped_key(version_key)]
+    return keys
+
+
+def list_version():
+    return _version(LIST_VERSION_KEY)
+
+
+def bump_list_version():
+    """
+    Marks every cached list page as stale. Pages are not deleted, so readers
+    keep being served the old page while one worker rebuilds it.
+    """
+    return _bump(LIST_VERSION_KEY)
+
+
+def post_version(pk):
+    return _version(post_version_key(pk), POST_VERSION_TIMEOUT)
+
+
+def peek_post_version(pk):
+    """The post's version, or None if it has none; never creates one."""
+    return cache.get(post_version_key(pk))
+
+
+def bump_post_version(pk):
+    return _bump(post_version_key(pk), POST_VERSION_TIMEOUT)
+
+
+def seed_post_versions(pks):
+    """
+    {pk: version} for posts known to exist whose version key is missing,
+    created with one pipelined SET NX. Ids that were never found get no
+    version key: their negative entries are stored under version None.
+    """
+    seeded = cache.add_many({post_version_key(pk): _clock() for pk in pks}, timeout=POST_VERSION_TIMEOUT)
+    return {pk: seeded[post_version_key(pk)] for pk in pks}
+
+
+def _clock():
+    # Versions are seeded from the clock so a flushed counter never goes
+    # backwards and an ETag handed out before the flush cannot match new
+    # content.
+    return int(time.time() * 1000)
+
+
+def _version(key, timeout=None):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _clock(), timeout=timeout)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key, timeout=None):
+    if settings.DATABASE_REPLICAS:
+        cache.set(bumped_key(key), 1, timeout=settings.DATABASE_REPLICA_PIN_SECONDS)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return _version(key, timeout)
+
+
+def get_post(pk, build, fields=None):
+    """
+    read_through() for post:{pk}. The version key is only created once
+    `build` has found the post, so lookups of ids that do not exist leave
+    nothing behind but a short-lived negative entry.
+    """
+    key, version_key = post_key(pk, fields), post_version_key(pk)
+    found = cache.get_many(_with_bumped([key, version_key], version_key))
+    return read_through(
+        key, build, found.get(key), version=found.get(version_key),
+        seed_version=lambda: seed_post_versions([pk])[pk], primary=bumped_key(version_key) in found,
+    )
+
+
+def get_posts(pks, build_many, fields=None):
+    """
+    Batch read of post:{pk} entries and their versions with one get_many.
+
+    `build_many` receives the ids that were missing or stale and returns a
+    {pk: value} dict for those that exist. The results are backfilled with
+    set_many, and ids that do not exist get a negative entry. Returns
+    {pk: value} for the posts that exist.
+
+    Every post write also bumps the list version, so the batch is built
+    from the primary while that was bumped recently.
+    """
+    keys = {pk: post_key(pk, fields) for pk in pks}
+    found = cache.get_many(
+        _with_bumped(list(keys.values()) + [post_version_key(pk) for pk in pks], LIST_VERSION_KEY)
+    )
+    now = time.time()
+
+    values, missing, versions = {}, [], {}
+    for pk, key in keys.items():
+        versions[pk] = found.get(post_version_key(pk))
+        entry = found.get(key)
+        if entry is not None and entry["fresh_until"] > now and entry["version"] == versions[pk]:
+            if entry["value"] is not None:
+                values[pk] = entry["value"]
+        else:
+            missing.append(pk)
+    if keys:
+        record_cache("hits", post_key(pks[0], fields), len(keys) - len(missing))
+        record_cache("misses", post_key(pks[0], fields), len(missing))
+
+    if missing:
+        with use_primary() if bumped_key(LIST_VERSION_KEY) in found else nullcontext():
+            built = build_many(missing)
+        values.update(built)
+        versions.update(seed_post_versions([pk for pk in built if versions[pk] is None]))
+        store_many({keys[pk]: (value, versions[pk]) for pk, value in built.items()})
+        store_many(
+            {keys[pk]: (None, versions[pk]) for pk in missing if pk not in built},
+            ttl=settings.POSTS_CACHE_NEGATIVE_TTL,
+        )
+    return values
+
+
+def get_page(cursor, page_size, build, fields=None):
+    return _get_listing(page_key(cursor, page_size, fields), build)
+
+
+def get_user_page(user_id, cursor, page_size, build):
+    return _get_listing(user_page_key(user_id, cursor, page_size), build)
+
+
+def get_search_page(match, cursor, page_size, build):
+    return _get_listing(search_key(match, cursor, page_size), build)
+
+
+def _get_listing(key, build):
+    # Listings are validated by the collection version, which every post
+    # write bumps.
+    found = cache.get_many(_with_bumped([key, LIST_VERSION_KEY], LIST_VERSION_KEY))
+    version = found.get(LIST_VERSION_KEY)
+    if version is None:
+        version = list_version()
+    return read_through(key, build, found.get(key), version=version, primary=bumped_key(LIST_VERSION_KEY) in found)
+
+
+def read_through(key, build, entry, version=None, seed_version=None, primary=False):
+    """
+    Stale-while-revalidate read with single-flight rebuilds.
+
+    Entries are stored as {"value", "fresh_until", "version"} and kept in
+    Redis for POSTS_CACHE_TTL + POSTS_CACHE_GRACE seconds. A fresh entry is
+    returned as is. A stale one is rebuilt by whichever worker wins the
+    short rebuild lock while everyone else keeps getting the stale value.
+    On a cold miss the losers wait briefly for the winner's result.
+
+    A build returning None means "does not exist"; that answer is cached
+    too, for POSTS_CACHE_NEGATIVE_TTL seconds only.
+
+    With `seed_version`, `version` may be None; it is called to create the
+    version once a build finds something to store under it. With `primary`,
+    builds read from the primary database (see bumped_key()).
+
+    Returns (value, version), where version is the one the returned value
+    was built for; it is what the ETag of the response must be based on.
+    """
+    if primary:
+        build = _on_primary(build)
+    if entry is not None:
+        if entry["fresh_until"] > time.time() and entry["version"] == version:
+            record_cache("hits", key)
+            return entry["value"], entry["version"]
+        token = _acquire_lock(key)
+        if token is None:
+            record_cache("hits", key)
+            return entry["value"], entry["version"]
+        record_cache("misses", key)
+        return _rebuild(key, build, version, token, seed_version)
+
+    record_cache("misses", key)
+    token = _acquire_lock(key)
+    if token is not None:
+        return _rebuild(key, build, version, token, seed_version)
+
+    deadline = time.time() + settings.POSTS_CACHE_LOCK_WAIT
+    while time.time() < deadline:
+        time.sleep(0.02)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry["value"], entry["version"]
+    # The rebuilding worker is too slow; answer from the database ourselves.
+    value = build()
+    if value is not None and version is None and seed_version is not None:
+        version = seed_version()
+    return value, version
+
+
+def _on_primary(build):
+    def build_on_primary():
+        with use_primary():
+            return build()
+    return build_on_primary
+
+
+def store(key, value, version=None, ttl=None):
+    ttl = settings.POSTS_CACHE_TTL if ttl is None else ttl
+    entry = {"value": value, "fresh_until": time.time() + ttl, "version": version}
+    cache.set(key, entry, timeout=ttl + settings.POSTS_CACHE_GRACE)
+    record_cache("sets", key)
+
+
+def store_many(values, ttl=None):
+    """
+    Stores {key: (value, version)} pairs with a single set_many.
+    """
+    if not values:
+        return
+    ttl = settings.POSTS_CACHE_TTL if ttl is None else ttl
+    fresh_until = time.time() + ttl
+    cache.set_many(
+        {
+            key: {"value": value, "fresh_until": fresh_until, "version": version}
+            for key, (value, version) in values.items()
+        },
+        timeout=ttl + settings.POSTS_CACHE_GRACE,
+    )
+    for key in values:
+        record_cache("sets", key)
+
+
+def _rebuild(key, build, version, token, seed_version=None):
+    try:
+        value = build()
+        if value is None:
+            store(key, None, version, ttl=settings.POSTS_CACHE_NEGATIVE_TTL)
+        else:
+            if version is None and seed_version is not None:
+                version = seed_version()
+            store(key, value, version)
+        return value, version
+    finally:
+        _release_lock(key, token)
+
+
+def _lock_key(key):
+    return f"lock:{key}"
+
+
+def _acquire_lock(key):
+    token = uuid.uuid4().hex
+    if cache.add(_lock_key(key), token, timeout=settings.POSTS_CACHE_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release_lock(key, token):
+    # Only drop the lock if it is still ours; it may have expired and been
+    # taken by another worker while we were rebuilding.
+    if cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
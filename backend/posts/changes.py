@@ -0,0 +1,101 @@
+"""
+Delta sync: the posts created, updated or deleted after a cursor.
+
+The cursor holds two positions, (updated_at, id) in posts_post and
+(deleted_at, id) in the tombstones, so a poll costs an index seek plus
+the rows that actually changed.
+"""
+import base64
+import binascii
+import datetime
+import json
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Post, PostTombstone
+from .pagination import InvalidCursor
+from .serializers import post_rows, serialize_rows
+
+# Fields of the changed posts unless ?fields= asks otherwise.
+CHANGES_FIELDS = ('id', 'title', 'summary', 'user', 'created_at', 'updated_at')
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class ExpiredCursor(InvalidCursor):
+    """Raised for cursors older than the tombstones we still have."""
+
+
+def encode_changes_cursor(posts_at, post_id, deleted_at, tombstone_id):
+    raw = json.dumps(
+        [posts_at.isoformat(), post_id, deleted_at.isoformat(), tombstone_id], separators=(",", ":")
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_changes_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        posts_at, post_id, deleted_at, tombstone_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        posts_at, deleted_at = parse_datetime(posts_at), parse_datetime(deleted_at)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor.")
+    if None in (posts_at, deleted_at) or not isinstance(post_id, int) or not isinstance(tombstone_id, int):
+        raise InvalidCursor("Invalid cursor.")
+    # Ours always carry an offset; a naive one cannot be compared with now().
+    if timezone.is_naive(posts_at) or timezone.is_naive(deleted_at):
+        raise InvalidCursor("Invalid cursor.")
+    return posts_at, post_id, deleted_at, tombstone_id
+
+
+def _after(queryset, field, at, pk, until):
+    return (
+        queryset.filter(Q(**{f"{field}__gt": at}) | Q(**{field: at, "id__gt": pk}), **{f"{field}__lte": until})
+        .order_by(field, "id")
+    )
+
+
+def get_changes(since, page_size, fields=CHANGES_FIELDS):
+    """
+    Returns {"changed", "deleted", "cursor", "has_more"} for the changes
+    after `since`, or for everything when `since` is empty.
+
+    Only changes at least POSTS_CHANGES_SETTLE_SECONDS old are returned, so
+    a transaction that commits a little after its timestamp was taken is
+    not skipped by a cursor that already moved past it.
+    """
+    until = timezone.now() - datetime.timedelta(seconds=settings.POSTS_CHANGES_SETTLE_SECONDS)
+    if since:
+        posts_at, post_id, deleted_at, tombstone_id = decode_changes_cursor(since)
+        retention = datetime.timedelta(days=settings.POSTS_TOMBSTONE_RETENTION_DAYS)
+        if deleted_at < timezone.now() - retention:
+            raise ExpiredCursor("Cursor expired; sync from scratch.")
+    else:
+        # A new client has nothing to delete: skip the existing tombstones.
+        posts_at, post_id, deleted_at, tombstone_id = _EPOCH, 0, until, 0
+
+    rows = list(_after(post_rows(Post.objects.all(), fields), "updated_at", posts_at, post_id, until)[:page_size + 1])
+    tombstones = list(
+        _after(PostTombstone.objects.all(), "deleted_at", deleted_at, tombstone_id, until)
+        .values_list("id", "post_id", "deleted_at")[:page_size + 1]
+    )
+    has_more = len(rows) > page_size or len(tombstones) > page_size
+    rows = rows[:page_size]
+    if rows:
+        posts_at, post_id = rows[-1].updated_at, rows[-1].id
+    if len(tombstones) > page_size:
+        tombstones = tombstones[:page_size]
+        tombstone_id, _, deleted_at = tombstones[-1]
+    else:
+        # Every tombstone up to `until` has been seen; moving the position
+        # there keeps the cursor of a client that polls regularly from
+        # expiring when nothing gets deleted for a while.
+        last = tombstones[-1] if tombstones else None
+        deleted_at, tombstone_id = until, last[0] if last and last[2] == until else 0
+    return {
+        "changed": serialize_rows(rows, fields),
+        "deleted": [pk for _, pk, _ in tombstones],
+        "cursor": encode_changes_cursor(posts_at, post_id, deleted_at, tombstone_id),
+        "has_more": has_more,
+    }
@@ -0,0 +1,44 @@
+"""
+Post content storage: a short plain-text summary for listings, and zlib
+compression of large bodies.
+
+A compressed post keeps "" in `content` and the compressed body in
+`content_zlib`; only code that actually returns the body decompresses it.
+"""
+import zlib
+from django.conf import settings
+
+SUMMARY_LENGTH = 200
+
+
+def summarize(content):
+    """
+    First SUMMARY_LENGTH characters of `content` with whitespace collapsed,
+    cut at a word boundary and marked with an ellipsis when shortened.
+    """
+    text = " ".join(content.split())
+    if len(text) <= SUMMARY_LENGTH:
+        return text
+    cut = text[:SUMMARY_LENGTH].rsplit(" ", 1)[0] or text[:SUMMARY_LENGTH]
+    return cut.rstrip(" .,;:") + "…"
+
+
+def compress(content):
+    """
+    Returns the zlib-compressed body when `content` is at least
+    POSTS_CONTENT_COMPRESS_MIN_SIZE bytes and compresses smaller, else None.
+    """
+    raw = content.encode()
+    if len(raw) < settings.POSTS_CONTENT_COMPRESS_MIN_SIZE:
+        return None
+    packed = zlib.compress(raw)
+    return packed if len(packed) < len(raw) else None
+
+
+def decompress(content_zlib):
+    return zlib.decompress(content_zlib).decode()
+
+
+def unpack(content, content_zlib):
+    """The post body from its `content` and `content_zlib` columns."""
+    return content if content_zlib is None else decompress(content_zlib)
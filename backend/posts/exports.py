@@ -0,0 +1,103 @@
+import csv
+import datetime
+import itertools
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .content import unpack
+from .models import Post
+
+EXPORT_COLUMNS = ["id", "title", "content", "user", "created_at"]
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def parse_filters(user=None, created_after=None, created_before=None):
+    """
+    Validates export filters given as strings; raises ValueError.
+    Datetimes may be plain dates, which are taken as midnight UTC.
+    """
+    filters = {}
+    if user not in (None, ""):
+        try:
+            filters["user_id"] = int(user)
+        except (TypeError, ValueError):
+            raise ValueError("user must be an integer.")
+    for name, lookup, value in (
+        ("created_after", "created_at__gte", created_after),
+        ("created_before", "created_at__lt", created_before),
+    ):
+        if value in (None, ""):
+            continue
+        parsed = parse_datetime(value)
+        if parsed is None and parse_date(value) is not None:
+            parsed = parse_datetime(f"{value}T00:00:00")
+        if parsed is None:
+            raise ValueError(f"{name} must be an ISO 8601 date or datetime.")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+        filters[lookup] = parsed
+    return filters
+
+
+def export_rows(filters, chunk_size=None):
+    """
+    Yields one tuple per post, in id order, fetching chunk_size rows at a
+    time so memory stays flat regardless of the table size.
+    """
+    queryset = (
+        Post.objects.filter(**filters)
+        .order_by("id")
+        .values_list("id", "title", "content", "content_zlib", "user_id", "created_at")
+    )
+    rows = queryset.iterator(chunk_size=chunk_size or settings.POSTS_EXPORT_CHUNK_SIZE)
+    return (
+        (pk, title, unpack(content, content_zlib), user_id, created_at)
+        for pk, title, content, content_zlib, user_id, created_at in rows
+    )
+
+
+def iter_ndjson(rows):
+    for pk, title, content, user_id, created_at in rows:
+        yield json.dumps({
+            "id": pk,
+            "title": title,
+            "content": content,
+            "user": user_id,
+            "created_at": created_at.isoformat(),
+        }) + "\n"
+
+
+class _Echo:
+    """File-like object whose write() hands back the line csv.writer produced."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for pk, title, content, user_id, created_at in rows:
+        yield writer.writerow([pk, title, content, user_id, created_at.isoformat()])
+
+
+def iter_export(fmt, rows):
+    return iter_csv(rows) if fmt == "csv" else iter_ndjson(rows)
+
+
+async def aiter_export(lines, batch_size=None):
+    """
+    Async iterator over `lines` for ASGI servers, which would otherwise read
+    a sync iterator into memory in one go. Each batch of lines is pulled,
+    cursor included, in a single sync_to_async call.
+    """
+    next_batch = sync_to_async(lambda: list(itertools.islice(lines, batch_size or settings.POSTS_EXPORT_CHUNK_SIZE)))
+    while batch := await next_batch():
+        for line in batch:
+            yield line
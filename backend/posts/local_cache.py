@@ -0,0 +1,243 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+MISSING = object()
+
+INVALIDATION_CHANNEL = "posts:invalidate"
+
+
+class HitCounter:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU with a per-entry TTL.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = HitCounter()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.stats.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return item[0]
+
+    def set(self, key, value, timeout=None):
+        ttl = min(timeout, self.ttl) if isinstance(timeout, (int, float)) else self.ttl
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache:
+    """
+    Puts a LocalCache in front of a Django cache (Redis).
+
+    Every write goes to Redis and is announced on a pub/sub channel, and
+    each process evicts the announced keys from its local tier. If a message
+    is lost, a local entry still expires within POSTS_LOCAL_CACHE_TTL.
+    Lock keys are never held locally. With POSTS_LOCAL_CACHE_ENABLED off,
+    this is a pass-through that only counts remote hits and misses.
+    """
+
+    def __init__(self, remote, broker_factory, local=None):
+        self.remote = remote
+        self.remote_stats = HitCounter()
+        self._broker_factory = broker_factory
+        self._local = local
+        self._origin = uuid.uuid4().hex
+        # Bumped on every remote invalidation; a read that raced with one
+        # does not fill the local tier with what may be the old value.
+        self._generation = 0
+        self._subscribed = False
+        self._lock = threading.Lock()
+
+    # Tier plumbing
+
+    def _tier(self):
+        if self._local is None:
+            if not settings.POSTS_LOCAL_CACHE_ENABLED:
+                return None
+            with self._lock:
+                if self._local is None:
+                    self._local = LocalCache(settings.POSTS_LOCAL_CACHE_MAX_ENTRIES, settings.POSTS_LOCAL_CACHE_TTL)
+        if not self._subscribed:
+            with self._lock:
+                if not self._subscribed:
+                    self._broker_factory().subscribe(INVALIDATION_CHANNEL, self._on_invalidate)
+                    self._subscribed = True
+        return self._local
+
+    def _on_invalidate(self, message):
+        # Messages are "<origin>:<key>\n<key>..."; "*" clears everything.
+        origin, _, keys = message.partition(":")
+        if origin == self._origin or self._local is None:
+            return
+        self._generation += 1
+        if keys == "*":
+            self._local.clear()
+            return
+        for key in keys.split("\n"):
+            self._local.delete(key)
+
+    def _invalidate(self, keys, local):
+        keys = list(keys)
+        for key in keys:
+            local.delete(key)
+        self._broker_factory().publish(INVALIDATION_CHANNEL, f"{self._origin}:" + "\n".join(keys))
+
+    @staticmethod
+    def _cacheable(key):
+        return not key.startswith("lock:")
+
+    def stats(self):
+        local = self._local.stats.as_dict() if self._local is not None else None
+        return {"local": local, "remote": self.remote_stats.as_dict()}
+
+    # Django cache API subset used by the posts app
+
+    def get(self, key, default=None):
+        local = self._tier() if self._cacheable(key) else None
+        if local is not None:
+            value = local.get(key)
+            if value is not MISSING:
+                return value
+        generation = self._generation
+        value = self.remote.get(key, MISSING)
+        if value is MISSING:
+            self.remote_stats.misses += 1
+            return default
+        self.remote_stats.hits += 1
+        if local is not None and generation == self._generation:
+            local.set(key, value)
+        return value
+
+    def get_many(self, keys):
+        local = self._tier()
+        found, remote_keys = {}, []
+        for key in keys:
+            value = local.get(key) if local is not None and self._cacheable(key) else MISSING
+            if value is MISSING:
+                remote_keys.append(key)
+            else:
+                found[key] = value
+        if remote_keys:
+            generation = self._generation
+            fetched = self.remote.get_many(remote_keys)
+            self.remote_stats.hits += len(fetched)
+            self.remote_stats.misses += len(remote_keys) - len(fetched)
+            if local is not None and generation == self._generation:
+                for key, value in fetched.items():
+                    if self._cacheable(key):
+                        local.set(key, value)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.remote.set(key, value, timeout=timeout)
+        local = self._tier()
+        if local is not None and self._cacheable(key):
+            self._invalidate([key], local)
+            local.set(key, value, timeout)
+
+    def set_many(self, mapping, timeout=DEFAULT_TIMEOUT):
+        self.remote.set_many(mapping, timeout=timeout)
+        local = self._tier()
+        if local is not None:
+            self._invalidate(mapping, local)
+            for key, value in mapping.items():
+                local.set(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        added = self.remote.add(key, value, timeout=timeout)
+        local = self._tier()
+        if added and local is not None and self._cacheable(key):
+            self._invalidate([key], local)
+        return added
+
+    def add_many(self, mapping, timeout=None):
+        """
+        add() for several keys, as one pipelined round of SET NX and GET on
+        Redis. Returns {key: value} with what each key holds afterwards,
+        whether this call or a concurrent one wrote it.
+        """
+        if not mapping:
+            return {}
+        client = getattr(self.remote, "client", None)
+        if hasattr(client, "get_client"):  # django-redis
+            pipeline = client.get_client(write=True).pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipeline.set(client.make_key(key), client.encode(value), nx=True, ex=timeout)
+                pipeline.get(client.make_key(key))
+            results = pipeline.execute()
+            added = [key for key, ok in zip(mapping, results[0::2]) if ok]
+            stored = {key: client.decode(raw) for key, raw in zip(mapping, results[1::2])}
+        else:
+            added = [key for key, value in mapping.items() if self.remote.add(key, value, timeout=timeout)]
+            stored = {key: self.remote.get(key) for key in mapping}
+        local = self._tier()
+        if added and local is not None:
+            self._invalidate(added, local)
+        return stored
+
+    def incr(self, key, delta=1):
+        value = self.remote.incr(key, delta)
+        local = self._tier()
+        if local is not None:
+            self._invalidate([key], local)
+        return value
+
+    def delete(self, key):
+        self.remote.delete(key)
+        local = self._tier()
+        if local is not None and self._cacheable(key):
+            self._invalidate([key], local)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        self.remote.delete_many(keys)
+        local = self._tier()
+        if local is not None:
+            self._invalidate(keys, local)
+
+    def clear(self):
+        self.remote.clear()
+        local = self._tier()
+        if local is not None:
+            local.clear()
+            self._broker_factory().publish(INVALIDATION_CHANNEL, f"{self._origin}:*")
@@ -0,0 +1,67 @@
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from posts.cache import bump_list_version, page_key, post_key
+from posts.models import Post
+from posts.serializers import LIST_FIELDS
+
+User = get_user_model()
+
+MODES = [
+    ("pickled data", {"POSTS_CACHE_RENDERED": False, "POSTS_CACHE_GZIP": False}),
+    ("rendered json", {"POSTS_CACHE_RENDERED": True, "POSTS_CACHE_GZIP": False}),
+    ("rendered json + gzip", {"POSTS_CACHE_RENDERED": True, "POSTS_CACHE_GZIP": True}),
+]
+
+
+class Command(BaseCommand):
+    help = "Compares posts cache hit latency for cached data vs pre-rendered JSON bodies."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100, help="Posts to seed (rolled back afterwards).")
+        parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint and mode.")
+        parser.add_argument("--page-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        client = APIClient(HTTP_ACCEPT_ENCODING="gzip")
+        with transaction.atomic():
+            user = User(username="bench_post_cache", email="bench_post_cache@example.com")
+            user.save()
+            posts = Post.objects.bulk_create(
+                Post(title=f"Post {i}", content="lorem ipsum " * 40, user=user)
+                for i in range(options["posts"])
+            )
+            keys = [post_key(p.pk) for p in posts] + [page_key("", options["page_size"], LIST_FIELDS)]
+            targets = [
+                ("list", reverse("posts:posts-list"), {"page_size": options["page_size"]}),
+                ("detail", reverse("posts:post-detail", args=[posts[0].pk]), {}),
+            ]
+            try:
+                for mode, overrides in MODES:
+                    with override_settings(**overrides):
+                        cache.delete_many(keys)
+                        bump_list_version()
+                        for name, url, params in targets:
+                            client.get(url, params)  # fill the cache
+                            timings = []
+                            for _ in range(options["requests"]):
+                                start = time.perf_counter()
+                                client.get(url, params)
+                                timings.append((time.perf_counter() - start) * 1000)
+                            self.report(mode, name, timings)
+            finally:
+                cache.delete_many(keys)
+                transaction.set_rollback(True)
+
+    def report(self, mode, name, timings):
+        timings.sort()
+        self.stdout.write(
+            f"{mode:<22} {name:<7} mean={statistics.mean(timings):.3f}ms "
+            f"p50={timings[len(timings) // 2]:.3f}ms p99={timings[int(len(timings) * 0.99)]:.3f}ms"
+        )
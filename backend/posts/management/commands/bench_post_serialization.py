@@ -0,0 +1,46 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from posts.models import Post
+from posts.serializers import PostSerializer, post_rows, serialize_rows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Compares PostSerializer with the values_list() fast path on cache-miss sized reads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[10_000, 100_000],
+            help="Row counts to measure (seeded and rolled back afterwards).",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per path; the best one is reported.")
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        paths = [
+            ("PostSerializer", lambda qs: PostSerializer(qs, many=True).data),
+            ("values_list", lambda qs: serialize_rows(post_rows(qs))),
+        ]
+        with transaction.atomic():
+            user = User(username="bench_post_serialization", email="bench_post_serialization@example.com")
+            user.save()
+            seeded = 0
+            for rows in sorted(options["rows"]):
+                Post.objects.bulk_create(
+                    (Post(title=f"Post {i}", content="lorem ipsum " * 40, user=user) for i in range(seeded, rows)),
+                    batch_size=2000,
+                )
+                seeded = rows
+                queryset = Post.objects.filter(user=user).order_by("-created_at", "-id")
+                for name, serialize in paths:
+                    best = float("inf")
+                    for _ in range(options["repeat"]):
+                        start = time.perf_counter()
+                        renderer.render(serialize(queryset.all()))
+                        best = min(best, time.perf_counter() - start)
+                    self.stdout.write(f"{rows:>8} rows {name:<15} {best * 1000:9.1f}ms {rows / best:12,.0f} rows/s")
+            transaction.set_rollback(True)
@@ -0,0 +1,103 @@
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+TARGETS = [
+    ("sync", "posts:posts-list"),
+    ("async", "posts:async-posts-list"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves the project with uvicorn and compares throughput and latency of the sync "
+        "and async posts list views under many concurrent keep-alive connections."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--connections", type=int, default=200, help="Concurrent keep-alive connections.")
+        parser.add_argument("--requests", type=int, default=20, help="Requests per connection and view.")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--no-server", action="store_true", help="Benchmark an already running server.")
+
+    def handle(self, *args, **options):
+        server = None
+        if not options["no_server"]:
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "source.asgi:application",
+                 "--host", options["host"], "--port", str(options["port"]), "--log-level", "warning"],
+            )
+        try:
+            asyncio.run(self.wait_for_server(options["host"], options["port"]))
+            for name, url_name in TARGETS:
+                path = f"{reverse(url_name)}?page_size={options['page_size']}"
+                elapsed, timings, errors = asyncio.run(self.drive(options, path))
+                self.report(name, elapsed, timings, errors)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    async def wait_for_server(self, host, port, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                _, writer = await asyncio.open_connection(host, port)
+                writer.close()
+                return
+            except OSError:
+                await asyncio.sleep(0.1)
+        raise CommandError(f"Server did not come up on {host}:{port}.")
+
+    async def drive(self, options, path):
+        request = (
+            f"GET {path} HTTP/1.1\r\nHost: {options['host']}\r\nAccept: application/json\r\n\r\n"
+        ).encode()
+        timings, errors = [], []
+
+        async def connection():
+            reader, writer = await asyncio.open_connection(options["host"], options["port"])
+            try:
+                for _ in range(options["requests"]):
+                    start = time.perf_counter()
+                    writer.write(request)
+                    status = await self.read_response(reader)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    if status != 200:
+                        errors.append(status)
+            finally:
+                writer.close()
+
+        # Warm the cache so both views are measured on hits.
+        await connection()
+        timings.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*[connection() for _ in range(options["connections"])])
+        return time.perf_counter() - start, timings, errors
+
+    async def read_response(self, reader):
+        status_line = await reader.readline()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        await reader.readexactly(length)
+        return int(status_line.split()[1])
+
+    def report(self, name, elapsed, timings, errors):
+        timings.sort()
+        self.stdout.write(
+            f"{name:<6} {len(timings) / elapsed:,.0f} req/s mean={statistics.mean(timings):.2f}ms "
+            f"p50={timings[len(timings) // 2]:.2f}ms p99={timings[int(len(timings) * 0.99)]:.2f}ms "
+            f"errors={len(errors)}"
+        )
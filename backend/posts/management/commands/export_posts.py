@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from posts.exports import CONTENT_TYPES, export_rows, iter_export, parse_filters
+
+
+class Command(BaseCommand):
+    help = "Streams posts as NDJSON or CSV to stdout or a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(CONTENT_TYPES), default="ndjson")
+        parser.add_argument("--user", help="Only posts by this user id.")
+        parser.add_argument("--created-after", help="ISO date or datetime, inclusive.")
+        parser.add_argument("--created-before", help="ISO date or datetime, exclusive.")
+        parser.add_argument("--chunk-size", type=int, default=None)
+        parser.add_argument("--output", "-o", help="File to write to instead of stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_filters(options["user"], options["created_after"], options["created_before"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        rows = export_rows(filters, options["chunk_size"])
+        if not options["output"]:
+            for line in iter_export(options["format"], rows):
+                self.stdout.write(line, ending="")
+            return
+        with open(options["output"], "w", newline="", encoding="utf-8") as out:
+            out.writelines(iter_export(options["format"], rows))
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from posts import view_counts
+
+
+class Command(BaseCommand):
+    help = "Moves the pending post view counts from Redis into posts_post.view_count."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Posts updated per UPDATE statement.")
+        parser.add_argument(
+            "--interval", type=float, default=None,
+            help="Keep running and flush every INTERVAL seconds instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            written = view_counts.flush(batch_size=options["batch_size"])
+            self.stdout.write(f"Flushed {written} views.")
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
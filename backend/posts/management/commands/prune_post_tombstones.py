@@ -0,0 +1,14 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from posts.models import PostTombstone
+
+
+class Command(BaseCommand):
+    help = "Deletes post tombstones older than POSTS_TOMBSTONE_RETENTION_DAYS."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=settings.POSTS_TOMBSTONE_RETENTION_DAYS)
+        deleted, _ = PostTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(f"Deleted {deleted} tombstones.")
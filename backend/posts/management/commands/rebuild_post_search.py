@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from posts.search_index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the posts full-text index, e.g. after posts were written outside the app."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Indexed {rebuild_index()} posts.")
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from posts.cache import cache, list_version, page_key, post_key, post_version_key, seed_post_versions, store_many
+from posts.models import Post
+from posts.pagination import keyset, split_page
+from posts.rendering import prepare
+from posts.serializers import LIST_FIELDS, post_rows, serialize_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the posts cache after a deploy or a Redis flush: the first list pages "
+        "and the most recently created posts, written with set_many."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=5, help="List pages to precompute.")
+        parser.add_argument("--page-size", type=int, default=None, help="Defaults to POSTS_PAGE_SIZE.")
+        parser.add_argument("--posts", type=int, default=1000, help="Most recent posts to cache individually.")
+        parser.add_argument("--batch-size", type=int, default=200, help="Entries per set_many call.")
+        parser.add_argument("--workers", type=int, default=1, help="Batches built and written concurrently.")
+
+    def handle(self, *args, **options):
+        page_size = options["page_size"] or settings.POSTS_PAGE_SIZE
+        pages = self.warm_pages(options["pages"], page_size)
+        ids = list(Post.objects.order_by("-created_at", "-id").values_list("id", flat=True)[:options["posts"]])
+        batches = [ids[i:i + options["batch_size"]] for i in range(0, len(ids), options["batch_size"])]
+        if options["workers"] > 1:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                posts = sum(executor.map(self.warm_posts_in_thread, batches))
+        else:
+            posts = sum(map(self.warm_posts, batches))
+        self.stdout.write(f"Warmed {pages} list pages of {page_size} and {posts} posts.")
+
+    def warm_pages(self, count, page_size):
+        # Pages are chained by their cursors, so they are walked in order;
+        # all of them go to Redis in one set_many.
+        version = list_version()
+        entries, cursor = {}, ""
+        for _ in range(count):
+            queryset = keyset(post_rows(Post.objects.all(), LIST_FIELDS), cursor, page_size)
+            rows, next_cursor = split_page(list(queryset), page_size)
+            entries[page_key(cursor, page_size, LIST_FIELDS)] = (
+                prepare({"next": next_cursor, "results": serialize_rows(rows, LIST_FIELDS)}), version,
+            )
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+        store_many(entries)
+        return len(entries)
+
+    def warm_posts(self, pks):
+        found = cache.get_many([post_version_key(pk) for pk in pks])
+        rows = list(post_rows(Post.objects.filter(id__in=pks)))
+        versions = {row.id: found.get(post_version_key(row.id)) for row in rows}
+        versions.update(seed_post_versions([pk for pk, version in versions.items() if version is None]))
+        store_many({
+            post_key(row.id): (prepare(data), versions[row.id])
+            for row, data in zip(rows, serialize_rows(rows))
+        })
+        return len(rows)
+
+    def warm_posts_in_thread(self, pks):
+        try:
+            return self.warm_posts(pks)
+        finally:
+            # Each worker thread opens its own database connection.
+            connection.close()
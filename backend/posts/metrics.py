@@ -0,0 +1,184 @@
+"""
+Per-process metrics for the posts API, exposed in Prometheus text format
+when POSTS_METRICS_ENABLED is on.
+
+Every thread records into its own shard, so recording is a plain dict
+update without a lock; a scrape sums the shards of all threads.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    "posts_request_duration_seconds": ("histogram", "Request latency by view."),
+    "posts_cache_hits_total": ("counter", "Posts cache entries served from the cache, by key family."),
+    "posts_cache_misses_total": ("counter", "Posts cache entries missing or rebuilt, by key family."),
+    "posts_cache_sets_total": ("counter", "Posts cache entries written, by key family."),
+    "posts_db_queries_total": ("counter", "ORM queries executed, by database alias."),
+    "posts_db_query_seconds_total": ("counter", "Time spent in ORM queries, by database alias."),
+}
+
+
+class Registry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []
+        # Only taken when a thread creates its shard and on scrape.
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = (defaultdict(float), {})
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        self._shard()[0][(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        histograms = self._shard()[1]
+        histogram = histograms.get((name, labels))
+        if histogram is None:
+            # One count per bucket, one for +Inf, then the sum.
+            histogram = histograms[(name, labels)] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect_left(self.buckets, value)] += 1
+        histogram[-1] += value
+
+    def collect(self):
+        """
+        Returns ({(name, labels): value}, {(name, labels): histogram}) summed
+        over all threads.
+        """
+        counters, histograms = defaultdict(float), {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard_counters, shard_histograms in shards:
+            for key, value in shard_counters.copy().items():
+                counters[key] += value
+            for key, histogram in shard_histograms.copy().items():
+                total = histograms.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, value in enumerate(histogram):
+                    total[i] += value
+        return counters, histograms
+
+    def render(self):
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                count = 0
+                for le, value in zip(self.buckets + ("+Inf",), histogram):
+                    count += value
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', str(le)),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(histogram[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+registry = Registry()
+
+
+def enabled():
+    return settings.POSTS_METRICS_ENABLED
+
+
+def key_family(key):
+    """
+    post:{pk}[:fields:...] -> "post", posts:page:... -> "posts:page", and so on.
+    """
+    parts = key.split(":", 2)
+    return "post" if parts[0] == "post" else ":".join(parts[:2])
+
+
+def record_cache(event, key, count=1):
+    """`event` is one of "hits", "misses" or "sets"."""
+    if enabled():
+        registry.inc(f"posts_cache_{event}_total", (("family", key_family(key)),), count)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper installed on every connection by
+    install_query_timer().
+    """
+    if not enabled():
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        labels = (("alias", context["connection"].alias),)
+        registry.inc("posts_db_queries_total", labels)
+        registry.inc("posts_db_query_seconds_total", labels, time.perf_counter() - start)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of every request, labelled with the name of the
+    view that served it. Works for both sync and async stacks.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, seconds):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match is not None else "unmatched"
+        registry.observe("posts_request_duration_seconds", (("view", view), ("method", request.method)), seconds)
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:55
+
+import importlib
+from django.db import migrations, models
+
+# Adding the columns remakes posts_post on SQLite, which drops the FTS
+# triggers of 0003, so the index is set up again here. Compressed posts
+# keep "" in `content`; the index reads their summary instead, through a
+# view that serves as the external content table.
+INSTALL_FTS_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_ai",
+    "DROP TRIGGER IF EXISTS posts_post_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_post_fts_au",
+    "DROP TABLE IF EXISTS posts_post_fts",
+    """
+    CREATE VIEW IF NOT EXISTS posts_post_search AS
+    SELECT id, title, CASE WHEN content_zlib IS NULL THEN content ELSE summary END AS content
+    FROM posts_post
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts
+    USING fts5(title, content, content='posts_post_search', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_ai AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (
+            new.id, new.title, CASE WHEN new.content_zlib IS NULL THEN new.content ELSE new.summary END
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_ad AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES (
+            'delete', old.id, old.title, CASE WHEN old.content_zlib IS NULL THEN old.content ELSE old.summary END
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_au AFTER UPDATE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES (
+            'delete', old.id, old.title, CASE WHEN old.content_zlib IS NULL THEN old.content ELSE old.summary END
+        );
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (
+            new.id, new.title, CASE WHEN new.content_zlib IS NULL THEN new.content ELSE new.summary END
+        );
+    END
+    """,
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+]
+
+UNINSTALL_FTS_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_ai",
+    "DROP TRIGGER IF EXISTS posts_post_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_post_fts_au",
+    "DROP TABLE IF EXISTS posts_post_fts",
+    "DROP VIEW IF EXISTS posts_post_search",
+]
+
+
+def install_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in INSTALL_FTS_SQL:
+        schema_editor.execute(statement)
+
+
+def uninstall_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in UNINSTALL_FTS_SQL:
+        schema_editor.execute(statement)
+
+
+def reinstall_previous_fts(apps, schema_editor):
+    # Runs last when unapplying, after removing the columns has remade the
+    # table (and dropped the triggers) once more.
+    importlib.import_module("posts.migrations.0003_post_fts").install_fts(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_user_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_previous_fts),
+        migrations.AddField(
+            model_name='post',
+            name='content_zlib',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='summary',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(install_fts, uninstall_fts),
+    ]
@@ -0,0 +1,72 @@
+import zlib
+from django.db import migrations, transaction
+
+BATCH_SIZE = 500
+# Frozen copies of posts.content.SUMMARY_LENGTH and the default
+# POSTS_CONTENT_COMPRESS_MIN_SIZE.
+SUMMARY_LENGTH = 200
+COMPRESS_MIN_SIZE = 2048
+
+
+def summarize(content):
+    text = " ".join(content.split())
+    if len(text) <= SUMMARY_LENGTH:
+        return text
+    cut = text[:SUMMARY_LENGTH].rsplit(" ", 1)[0] or text[:SUMMARY_LENGTH]
+    return cut.rstrip(" .,;:") + "…"
+
+
+def compress(content):
+    raw = content.encode()
+    if len(raw) < COMPRESS_MIN_SIZE:
+        return None
+    packed = zlib.compress(raw)
+    return packed if len(packed) < len(raw) else None
+
+
+def batches(apps, schema_editor, **filters):
+    """
+    Yields the posts matching `filters` BATCH_SIZE at a time, each batch in
+    its own transaction so the table is never locked for long.
+    """
+    Post = apps.get_model('posts', 'Post')
+    db = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db):
+            batch = list(Post.objects.using(db).filter(id__gt=last_id, **filters).order_by('id')[:BATCH_SIZE])
+            if not batch:
+                return
+            yield Post, db, batch
+        last_id = batch[-1].id
+
+
+def backfill(apps, schema_editor):
+    for Post, db, batch in batches(apps, schema_editor, content_zlib__isnull=True):
+        for post in batch:
+            post.summary = summarize(post.content)
+            post.content_zlib = compress(post.content)
+            if post.content_zlib is not None:
+                post.content = ""
+        Post.objects.using(db).bulk_update(batch, ['summary', 'content', 'content_zlib'])
+
+
+def restore_content(apps, schema_editor):
+    for Post, db, batch in batches(apps, schema_editor, content_zlib__isnull=False):
+        for post in batch:
+            post.content = zlib.decompress(post.content_zlib).decode()
+            post.content_zlib = None
+        Post.objects.using(db).bulk_update(batch, ['content', 'content_zlib'])
+
+
+class Migration(migrations.Migration):
+    # Every batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ('posts', '0005_post_summary_content_zlib'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, restore_content),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:58
+
+import importlib
+from django.db import migrations, models
+
+# Adding view_count remakes posts_post on SQLite. That drops the FTS
+# triggers, and fails while the posts_post_search view of 0005 exists, so
+# the view is dropped first and both are created again afterwards; the
+# index itself is kept. The update trigger now only fires for the indexed
+# columns, so the batched view_count UPDATEs do not rewrite the index.
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_ai",
+    "DROP TRIGGER IF EXISTS posts_post_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_post_fts_au",
+    "DROP VIEW IF EXISTS posts_post_search",
+]
+
+INSTALL_SQL = [
+    """
+    CREATE VIEW posts_post_search AS
+    SELECT id, title, CASE WHEN content_zlib IS NULL THEN content ELSE summary END AS content
+    FROM posts_post
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_ai AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (
+            new.id, new.title, CASE WHEN new.content_zlib IS NULL THEN new.content ELSE new.summary END
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_ad AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES (
+            'delete', old.id, old.title, CASE WHEN old.content_zlib IS NULL THEN old.content ELSE old.summary END
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_au AFTER UPDATE OF title, content, summary, content_zlib ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES (
+            'delete', old.id, old.title, CASE WHEN old.content_zlib IS NULL THEN old.content ELSE old.summary END
+        );
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (
+            new.id, new.title, CASE WHEN new.content_zlib IS NULL THEN new.content ELSE new.summary END
+        );
+    END
+    """,
+]
+
+
+def _run(schema_editor, statements):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_view_and_triggers(apps, schema_editor):
+    _run(schema_editor, DROP_SQL)
+
+
+def install_view_and_triggers(apps, schema_editor):
+    _run(schema_editor, INSTALL_SQL)
+
+
+def reinstall_previous_fts(apps, schema_editor):
+    # Runs last when unapplying, after removing the column has remade the
+    # table once more.
+    importlib.import_module("posts.migrations.0005_post_summary_content_zlib").install_fts(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_backfill_post_summary_content_zlib'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_view_and_triggers, reinstall_previous_fts),
+        migrations.AddField(
+            model_name='post',
+            name='view_count',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(install_view_and_triggers, drop_view_and_triggers),
+    ]
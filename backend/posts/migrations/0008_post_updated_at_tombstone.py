@@ -0,0 +1,106 @@
+# Generated by Django 4.2.11 on 2026-10-18 13:00
+
+import importlib
+from django.db import migrations, models
+from django.db.models import F
+
+# Adding updated_at remakes posts_post on SQLite: as in 0007, the FTS view
+# and triggers are dropped first and created again afterwards.
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_ai",
+    "DROP TRIGGER IF EXISTS posts_post_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_post_fts_au",
+    "DROP VIEW IF EXISTS posts_post_search",
+]
+
+INSTALL_SQL = [
+    """
+    CREATE VIEW posts_post_search AS
+    SELECT id, title, CASE WHEN content_zlib IS NULL THEN content ELSE summary END AS content
+    FROM posts_post
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_ai AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (
+            new.id, new.title, CASE WHEN new.content_zlib IS NULL THEN new.content ELSE new.summary END
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_ad AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES (
+            'delete', old.id, old.title, CASE WHEN old.content_zlib IS NULL THEN old.content ELSE old.summary END
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_au AFTER UPDATE OF title, content, summary, content_zlib ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES (
+            'delete', old.id, old.title, CASE WHEN old.content_zlib IS NULL THEN old.content ELSE old.summary END
+        );
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (
+            new.id, new.title, CASE WHEN new.content_zlib IS NULL THEN new.content ELSE new.summary END
+        );
+    END
+    """,
+]
+
+
+def _run(schema_editor, statements):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_view_and_triggers(apps, schema_editor):
+    _run(schema_editor, DROP_SQL)
+
+
+def install_view_and_triggers(apps, schema_editor):
+    _run(schema_editor, INSTALL_SQL)
+
+
+def reinstall_previous_view_and_triggers(apps, schema_editor):
+    importlib.import_module("posts.migrations.0007_post_view_count").install_view_and_triggers(apps, schema_editor)
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing posts were last changed, as far as anyone knows, when they
+    # were created; the UPDATE does not touch the indexed columns.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.using(schema_editor.connection.alias).update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_view_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_view_and_triggers, reinstall_previous_view_and_triggers),
+        migrations.CreateModel(
+            name='PostTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['updated_at', 'id'], name='post_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posttombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_id_idx'),
+        ),
+        migrations.RunPython(install_view_and_triggers, drop_view_and_triggers),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.11 on 2026-10-18 15:00
+
+import importlib
+import zlib
+from django.db import migrations
+
+# 0005 indexed only the summary of compressed posts, so words further into
+# a large body were not searchable. The view and triggers now index the
+# full body through posts_unpack(), an SQL function that posts.content
+# registers on every connection (and this migration on its own).
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_ai",
+    "DROP TRIGGER IF EXISTS posts_post_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_post_fts_au",
+    "DROP VIEW IF EXISTS posts_post_search",
+]
+
+INSTALL_SQL = [
+    """
+    CREATE VIEW posts_post_search AS
+    SELECT id, title, posts_unpack(content, content_zlib) AS content
+    FROM posts_post
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_ai AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (
+            new.id, new.title, posts_unpack(new.content, new.content_zlib)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_ad AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES (
+            'delete', old.id, old.title, posts_unpack(old.content, old.content_zlib)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_au AFTER UPDATE OF title, content, summary, content_zlib ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES (
+            'delete', old.id, old.title, posts_unpack(old.content, old.content_zlib)
+        );
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (
+            new.id, new.title, posts_unpack(new.content, new.content_zlib)
+        );
+    END
+    """,
+]
+
+# The index still holds the summaries of compressed posts, which the new
+# view no longer returns for a 'delete'; start it over.
+REBUILD_SQL = "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')"
+
+
+def _unpack(content, content_zlib):
+    return content if content_zlib is None else zlib.decompress(content_zlib).decode()
+
+
+def _run(schema_editor, statements):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.connection.connection.create_function("posts_unpack", 2, _unpack, deterministic=True)
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def install_view_and_triggers(apps, schema_editor):
+    _run(schema_editor, DROP_SQL + INSTALL_SQL + [REBUILD_SQL])
+
+
+def reinstall_previous_view_and_triggers(apps, schema_editor):
+    previous = importlib.import_module("posts.migrations.0008_post_updated_at_tombstone")
+    _run(schema_editor, DROP_SQL + previous.INSTALL_SQL + [REBUILD_SQL])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_updated_at_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_view_and_triggers, reinstall_previous_view_and_triggers),
+    ]
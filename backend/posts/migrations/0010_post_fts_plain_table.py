@@ -0,0 +1,67 @@
+# Generated by Django 4.2.11 on 2026-10-18 16:00
+
+import importlib
+import zlib
+from django.db import migrations
+
+# 0009's triggers called posts_unpack(), which only exists on connections
+# the app opened, so writes from dbshell or a restore tool failed. The
+# index becomes a plain FTS5 table with the full body, written by the app
+# next to each row (see posts.search_index); posts_post has no triggers.
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_ai",
+    "DROP TRIGGER IF EXISTS posts_post_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_post_fts_au",
+    "DROP TABLE IF EXISTS posts_post_fts",
+    "DROP VIEW IF EXISTS posts_post_search",
+]
+
+CREATE_SQL = "CREATE VIRTUAL TABLE posts_post_fts USING fts5(title, content)"
+
+INSERT_SQL = "INSERT INTO posts_post_fts(rowid, title, content) VALUES (%s, %s, %s)"
+
+
+def _unpack(content, content_zlib):
+    return content if content_zlib is None else zlib.decompress(content_zlib).decode()
+
+
+def install_plain_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in DROP_SQL + [CREATE_SQL]:
+        schema_editor.execute(statement)
+    Post = apps.get_model('posts', 'Post')
+    rows = (
+        Post.objects.using(schema_editor.connection.alias)
+        .order_by('id')
+        .values_list('id', 'title', 'content', 'content_zlib')
+        .iterator(chunk_size=2000)
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(INSERT_SQL, (
+            (pk, title, _unpack(content, content_zlib)) for pk, title, content, content_zlib in rows
+        ))
+
+
+def reinstall_previous_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in DROP_SQL + [
+        "CREATE VIRTUAL TABLE posts_post_fts "
+        "USING fts5(title, content, content='posts_post_search', content_rowid='id')",
+    ]:
+        schema_editor.execute(statement)
+    importlib.import_module("posts.migrations.0009_post_fts_full_content").install_view_and_triggers(
+        apps, schema_editor
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_fts_full_content'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_plain_index, reinstall_previous_index),
+    ]
@@ -1,13 +1,89 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth import get_user_model
+from .content import compress, decompress, summarize
+from .search_index import index_posts
 User = get_user_model()
 
 
 class Post(models.Model):
     title = models.CharField(max_length=255)
+    summary = models.CharField(max_length=255, blank=True, default="", editable=False)
     content = models.TextField()
+    # Holds the body instead of `content` once it is large enough to be
+    # worth compressing; see posts.content.
+    content_zlib = models.BinaryField(null=True, editable=False)
+    # Written behind by posts.view_counts.flush(), never on the read path.
+    view_count = models.PositiveBigIntegerField(default=0, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Backs the keyset pagination of the posts list.
+            models.Index(fields=["-created_at", "-id"], name="post_created_id_idx"),
+            # Backs the per-user feed.
+            models.Index(fields=["user", "-created_at", "-id"], name="post_user_created_id_idx"),
+            # Backs the delta sync of v1/api/posts/changes.
+            models.Index(fields=["updated_at", "id"], name="post_updated_id_idx"),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Only instances loaded with content_zlib get their body restored;
+        # the read paths that don't need it never select that column.
+        if "content_zlib" in post.__dict__ and post.content_zlib is not None:
+            post.content = decompress(post.content_zlib)
+        return post
+
+    def pack_content(self):
+        """
+        Fills summary and content_zlib from content, emptying content when
+        it gets compressed. Call before bulk_create, which skips save().
+        """
+        self.summary = summarize(self.content)
+        self.content_zlib = compress(self.content)
+        if self.content_zlib is not None:
+            self.content = ""
+
+    def save(self, *args, update_fields=None, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            self._save(*args, update_fields=update_fields, **kwargs)
+            # The search index holds the full body; see posts.search_index.
+            if update_fields is None or {"title", "content"} & set(update_fields):
+                index_posts([(self.pk, self.title, self.content)], using)
+
+    def _save(self, *args, update_fields=None, **kwargs):
+        if update_fields is not None:
+            # auto_now only sets updated_at on the instance; a partial save
+            # has to write it too, or delta sync never sees the edit.
+            update_fields = {*update_fields, "updated_at"}
+            if "content" not in update_fields:
+                return super().save(*args, update_fields=update_fields, **kwargs)
+            update_fields |= {"summary", "content_zlib"}
+        content = self.content
+        self.pack_content()
+        try:
+            super().save(*args, update_fields=update_fields, **kwargs)
+        finally:
+            # The instance keeps its full body, whatever was stored.
+            self.content = content
+
+
+class PostTombstone(models.Model):
+    """
+    Left behind by a deleted post so delta sync clients learn about the
+    delete. Pruned after POSTS_TOMBSTONE_RETENTION_DAYS.
+    """
+    post_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="tombstone_deleted_id_idx"),
+        ]
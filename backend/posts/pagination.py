@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def encode_cursor(created_at, pk):
+    """
+    Encodes the (created_at, id) position of the last row on a page.
+    """
+    raw = json.dumps([created_at.isoformat(), pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor back into a (created_at, id) tuple.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor.")
+
+    if created_at is None or not isinstance(pk, int):
+        raise InvalidCursor("Invalid cursor.")
+    return created_at, pk
+
+
+def get_page_size(value):
+    """
+    Returns the requested page size, clamped to POSTS_MAX_PAGE_SIZE.
+    """
+    if value in (None, ""):
+        return settings.POSTS_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor("Invalid page_size.")
+    if page_size < 1:
+        raise InvalidCursor("Invalid page_size.")
+    return min(page_size, settings.POSTS_MAX_PAGE_SIZE)
+
+
+def keyset(queryset, cursor, page_size):
+    """
+    Orders by (-created_at, -id) and seeks past `cursor`. One extra row is
+    fetched to tell whether there is a next page.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    return queryset[:page_size + 1]
+
+
+def split_page(rows, page_size):
+    """
+    Returns the rows of the page and the cursor of the next page, or None
+    when this is the last page.
+    """
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def paginate(queryset, cursor, page_size):
+    """
+    Keyset pagination over (-created_at, -id).
+    """
+    return split_page(list(keyset(queryset, cursor, page_size)), page_size)
@@ -0,0 +1,106 @@
+import gzip
+from collections import namedtuple
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+# A response body rendered once at cache-fill time, optionally gzipped.
+RenderedBody = namedtuple("RenderedBody", ["body", "gzipped"])
+
+_renderer = JSONRenderer()
+
+
+def prepare(data):
+    """
+    Returns what should be cached for `data`: the data itself, or its final
+    JSON body when POSTS_CACHE_RENDERED is on.
+    """
+    if data is None or not settings.POSTS_CACHE_RENDERED:
+        return data
+    body = _renderer.render(data)
+    if settings.POSTS_CACHE_GZIP and len(body) >= settings.POSTS_CACHE_GZIP_MIN_SIZE:
+        return RenderedBody(gzip.compress(body), True)
+    return RenderedBody(body, False)
+
+
+def respond(request, value, status):
+    """
+    Builds the response for a cached value. Pre-rendered bodies skip the
+    DRF renderer and content negotiation entirely.
+    """
+    if not isinstance(value, RenderedBody):
+        return Response(value, status=status)
+    return _body_response(request, value, status)
+
+
+def respond_raw(request, value, status):
+    """
+    Like respond(), for plain Django views: cached data is rendered here
+    with the same JSONRenderer DRF would use.
+    """
+    if not isinstance(value, RenderedBody):
+        value = RenderedBody(_renderer.render(value), False)
+    return _body_response(request, value, status)
+
+
+def _body_response(request, value, status):
+    response = HttpResponse(content_type="application/json", status=status)
+    if value.gzipped:
+        response["Vary"] = "Accept-Encoding"
+        if "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+            response["Content-Encoding"] = "gzip"
+            response.content = value.body
+            return response
+        response.content = gzip.decompress(value.body)
+        return response
+    response.content = value.body
+    return response
+
+
+def respond_many(request, values, status):
+    """
+    Wraps a list of cached values in {"results": [...]}. Pre-rendered bodies
+    are spliced together as bytes rather than decoded and rendered again.
+    """
+    if not any(isinstance(value, RenderedBody) for value in values):
+        return Response({"results": values}, status=status)
+
+    parts = []
+    for value in values:
+        if not isinstance(value, RenderedBody):
+            parts.append(_renderer.render(value))
+        elif value.gzipped:
+            parts.append(gzip.decompress(value.body))
+        else:
+            parts.append(value.body)
+    body = b'{"results":[' + b",".join(parts) + b"]}"
+    return HttpResponse(body, content_type="application/json", status=status)
+
+
+def not_modified(request, tag, wildcard=True):
+    """
+    Returns a 304 response when If-None-Match carries the ETag for `tag`
+    (in either content coding), otherwise None. "*" matches any current
+    representation, so only call this once the resource is known to exist,
+    or pass wildcard=False to leave "*" unmatched.
+    """
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return None
+    etags = {etag[2:] if etag.startswith("W/") else etag for etag in parse_etags(header)}
+    if (wildcard and "*" in etags) or f'"{tag}"' in etags or f'"{tag}-gz"' in etags:
+        response = HttpResponseNotModified()
+        response["ETag"] = f'"{tag}"'
+        return response
+    return None
+
+
+def set_etag(response, tag):
+    # A gzip-encoded body is a different representation, so it gets its own
+    # strong ETag.
+    if response.get("Content-Encoding") == "gzip":
+        tag = f"{tag}-gz"
+    response["ETag"] = f'"{tag}"'
+    return response
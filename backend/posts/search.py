@@ -0,0 +1,84 @@
+import base64
+import binascii
+import html
+import json
+from .models import Post
+from .pagination import InvalidCursor
+from .search_index import FTS_TABLE
+
+# snippet() wraps hits in these instead of <b></b>; they become tags only
+# after the post text around them has been HTML-escaped.
+HIT_START, HIT_END = "\x02", "\x03"
+
+
+def build_match_query(q):
+    """
+    Turns free text into an FTS5 query: every word must match, a trailing
+    `*` makes it a prefix search, and FTS5 operators are taken literally.
+    """
+    terms = []
+    for word in q.split():
+        prefix = word.endswith("*")
+        # The tokenizer ignores punctuation anyway; dropping quotes keeps
+        # every word a single literal FTS5 string.
+        word = word.rstrip("*").replace('"', "")
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return " ".join(terms)
+
+
+def encode_search_cursor(rank, pk):
+    raw = json.dumps([rank, pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor.")
+    if not isinstance(rank, (int, float)) or not isinstance(pk, int):
+        raise InvalidCursor("Invalid cursor.")
+    return rank, pk
+
+
+def highlight(snippet):
+    """The HTML of a snippet: escaped post text with hits in <b></b>."""
+    return html.escape(snippet).replace(HIT_START, "<b>").replace(HIT_END, "</b>")
+
+
+def search_posts(match, cursor, page_size):
+    """
+    Returns one page of posts matching `match`, best bm25 rank first, with
+    a `snippet` of the content around the hits, plus the next cursor. The
+    snippet is HTML: the post text is escaped and hits are wrapped in <b>.
+    """
+    params = [match]
+    after = ""
+    if cursor:
+        rank, pk = decode_search_cursor(cursor)
+        after = f"AND (bm25({FTS_TABLE}) > %s OR (bm25({FTS_TABLE}) = %s AND p.id > %s))"
+        params += [rank, rank, pk]
+    params.append(page_size + 1)
+
+    rows = list(Post.objects.raw(
+        f"""
+        SELECT p.id, p.title, p.user_id, p.created_at,
+               bm25({FTS_TABLE}) AS rank,
+               snippet({FTS_TABLE}, 1, '{HIT_START}', '{HIT_END}', '...', 12) AS snippet
+        FROM {FTS_TABLE} JOIN posts_post p ON p.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s {after}
+        ORDER BY rank, p.id
+        LIMIT %s
+        """,
+        params,
+    ))
+
+    for row in rows:
+        row.snippet = highlight(row.snippet)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_search_cursor(rows[-1].rank, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,67 @@
+"""
+The full-text index behind v1/api/posts/search.
+
+posts_post_fts is a plain FTS5 table holding each post's title and full
+body. Post.save(), the post_delete signal and posts_bulk_create write it
+next to the row; there are no triggers, since the body of a compressed
+post can only be read in Python. Rows written any other way (dbshell, a
+restore) are not searchable until `manage.py rebuild_post_search`.
+"""
+from django.apps import apps
+from django.db import connections, router, transaction
+from .content import unpack
+
+FTS_TABLE = "posts_post_fts"
+
+
+def _connection(using):
+    connection = connections[using or router.db_for_write(apps.get_model("posts", "Post"))]
+    # Search is SQLite-only; elsewhere there is no index to keep.
+    return connection if connection.vendor == "sqlite" else None
+
+
+def _insert(cursor, posts):
+    cursor.executemany(f"INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (%s, %s, %s)", posts)
+
+
+def index_posts(posts, using=None):
+    """Stores (id, title, body) tuples in the index, replacing those ids."""
+    connection = _connection(using)
+    posts = list(posts)
+    if connection is None or not posts:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk, _, _ in posts])
+        _insert(cursor, posts)
+
+
+def unindex_posts(pks, using=None):
+    connection = _connection(using)
+    if connection is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in pks])
+
+
+def rebuild_index(using=None, chunk_size=2000):
+    """Indexes every post from scratch; returns how many were indexed."""
+    connection = _connection(using)
+    if connection is None:
+        return 0
+    rows = (
+        apps.get_model("posts", "Post").objects.using(connection.alias)
+        .order_by("id")
+        .values_list("id", "title", "content", "content_zlib")
+        .iterator(chunk_size=chunk_size)
+    )
+    count = 0
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        batch = []
+        for pk, title, content, content_zlib in rows:
+            batch.append((pk, title, unpack(content, content_zlib)))
+            if len(batch) == chunk_size:
+                _insert(cursor, batch)
+                count, batch = count + len(batch), []
+        _insert(cursor, batch)
+    return count + len(batch)
@@ -1,8 +1,112 @@
 from rest_framework import serializers
+from .content import unpack
 from .models import Post
 
 
+class InvalidFields(ValueError):
+    """Raised when ?fields= names something PostSerializer does not have."""
+
+
 class PostSerializer(serializers.ModelSerializer):
+    """
+    Accepts an optional `fields` argument to return only a subset of the
+    declared fields.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    class Meta:
+        model = Post
+        fields = ['id', 'title', 'summary', 'content', 'user', 'created_at', 'updated_at']
+
+
+# What list endpoints return unless ?fields= asks otherwise: the summary
+# instead of the full body.
+LIST_FIELDS = ('id', 'title', 'summary', 'user', 'created_at')
+
+
+def parse_fields(value, default=None):
+    """
+    Parses a ?fields= value into PostSerializer field names, in declaration
+    order so equal sets share a cache key. Returns None for "all fields",
+    and `default` when there is no ?fields= at all.
+    """
+    if value is None:
+        return default
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested - set(PostSerializer.Meta.fields)
+    if unknown or not requested:
+        raise InvalidFields(f"fields must be a subset of {', '.join(PostSerializer.Meta.fields)}.")
+    if requested == set(PostSerializer.Meta.fields):
+        return None
+    return tuple(name for name in PostSerializer.Meta.fields if name in requested)
+
+
+# PostSerializer field -> columns read by the values_list() fast path.
+POST_COLUMNS = {
+    "id": ["id"],
+    "title": ["title"],
+    "summary": ["summary"],
+    "content": ["content", "content_zlib"],
+    "user": ["user_id"],
+    "created_at": ["created_at"],
+    "updated_at": ["updated_at"],
+}
+
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+def post_rows(queryset, fields=None):
+    """
+    Restricts the SELECT to the requested columns and returns named rows
+    instead of model instances. id and both timestamps are always loaded
+    since the keyset cursors are built from them.
+    """
+    names = fields or PostSerializer.Meta.fields
+    columns = dict.fromkeys(["id", *DATETIME_FIELDS] + [column for name in names for column in POST_COLUMNS[name]])
+    return queryset.values_list(*columns, named=True)
+
+
+def serialize_rows(rows, fields=None):
+    """
+    Returns what PostSerializer(many=True, fields=fields).data would for
+    rows from post_rows(), without building serializer fields per call or
+    running to_representation per field. Timestamps go through DRF's own
+    DateTimeField so the output stays identical, and content is only
+    decompressed here, when it was asked for.
+    """
+    names = fields or PostSerializer.Meta.fields
+    to_datetime = serializers.DateTimeField().to_representation
+    plan = [(name, POST_COLUMNS[name][0]) for name in names]
+    datetimes = [name for name in DATETIME_FIELDS if name in names]
+    results = []
+    for row in rows:
+        item = {name: getattr(row, column) for name, column in plan}
+        for name in datetimes:
+            item[name] = to_datetime(item[name])
+        if "content" in item:
+            item["content"] = unpack(item["content"], row.content_zlib)
+        results.append(item)
+    return results
+
+
+class PostSearchSerializer(serializers.ModelSerializer):
+    snippet = serializers.CharField(read_only=True)
+
     class Meta:
         model = Post
-        fields = ['id', 'title', 'content', 'user', 'created_at']
\ No newline at end of file
+        fields = ['id', 'title', 'user', 'created_at', 'snippet']
+
+
+class BulkPostSerializer(serializers.Serializer):
+    """
+    Validates one item of a bulk upload. `user` is a plain id here; the
+    view checks all ids of a batch against the database in one query.
+    """
+    title = serializers.CharField(max_length=255)
+    content = serializers.CharField()
+    user = serializers.IntegerField()
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from .cache import bump_list_version, bump_post_version, cache, post_key
+from . import view_counts
+from .models import PostTombstone
+from .search_index import unindex_posts
+
+User = get_user_model()
+
+
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.user_id).update(post_count=F("post_count") + 1)
+    # After the commit: a reader rebuilding between a bump and the commit
+    # would store the old rows under the new version.
+    pk = instance.pk
+    transaction.on_commit(lambda: _invalidate(pk, created), using=kwargs.get("using"))
+
+
+def post_deleted(sender, instance, **kwargs):
+    PostTombstone.objects.create(post_id=instance.pk)
+    unindex_posts([instance.pk], kwargs.get("using"))
+    User.objects.filter(pk=instance.user_id).update(post_count=F("post_count") - 1)
+    pk = instance.pk  # Collector.delete() sets it to None afterwards.
+    transaction.on_commit(lambda: _invalidate(pk, deleted=True), using=kwargs.get("using"))
+
+
+def _invalidate(pk, created=False, deleted=False):
+    if created or deleted:
+        # Drop any cached 404 (or the deleted post); the creating view writes through.
+        cache.delete(post_key(pk))
+    if deleted:
+        view_counts.forget(pk)
+    # Cached entries built for an older version are now stale.
+    bump_post_version(pk)
+    bump_list_version()
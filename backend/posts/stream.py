@@ -0,0 +1,155 @@
+"""
+Server-Sent Events stream of newly created posts.
+
+Creating views publish the new posts on the broker once their
+transaction commits. Each process subscribes once and fans messages out
+to one bounded asyncio.Queue per open stream, so an idle stream costs a
+coroutine and a queue, not a thread or a Redis connection.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+from django.conf import settings
+from .broker import get_broker
+from .models import Post
+from .serializers import LIST_FIELDS, post_rows, serialize_rows
+
+CHANNEL = "posts:created"
+# Put in a stream's queue when it fell too far behind; the stream ends and
+# the client resumes from its Last-Event-ID.
+OVERFLOW = object()
+
+
+def publish_created(posts):
+    """
+    Announces `posts` (LIST_FIELDS dicts) to every open stream. Call it
+    from transaction.on_commit so nobody hears of a post that is rolled
+    back.
+    """
+    if posts:
+        get_broker().publish(CHANNEL, json.dumps(posts))
+
+
+class StreamHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._brokers = set()
+
+    def open(self):
+        queue = asyncio.Queue(maxsize=settings.POSTS_STREAM_QUEUE_SIZE)
+        broker = get_broker()
+        with self._lock:
+            self._queues[queue] = asyncio.get_running_loop()
+            if broker not in self._brokers:
+                broker.subscribe(CHANNEL, self._dispatch)
+                self._brokers.add(broker)
+        return queue
+
+    def close(self, queue):
+        with self._lock:
+            self._queues.pop(queue, None)
+
+    def _dispatch(self, message):
+        # Runs on the broker's thread (or the publisher's, for LocalBroker).
+        posts = json.loads(message)
+        with self._lock:
+            queues = list(self._queues.items())
+        for queue, loop in queues:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, posts)
+            except RuntimeError:  # the loop is closed
+                self.close(queue)
+
+    @staticmethod
+    def _put(queue, posts):
+        try:
+            queue.put_nowait(posts)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(OVERFLOW)
+
+
+hub = StreamHub()
+
+
+def _event(post):
+    return f"id: {post['id']}\nevent: post\ndata: {json.dumps(post)}\n\n"
+
+
+async def replay(last_id):
+    """
+    The events a client missed since `last_id`, oldest first. When more
+    than POSTS_STREAM_REPLAY_MAX posts were missed, a single "resync" event
+    asks it to reload the list instead. Returns (chunks, ids replayed).
+    """
+    limit = settings.POSTS_STREAM_REPLAY_MAX
+    queryset = post_rows(Post.objects.filter(id__gt=last_id), LIST_FIELDS).order_by("id")
+    rows = [row async for row in queryset[:limit + 1]]
+    if len(rows) > limit:
+        latest = await Post.objects.order_by("-id").values_list("id", flat=True).afirst()
+        return [f"id: {latest}\nevent: resync\ndata: {{}}\n\n"], []
+    return [_event(post) for post in serialize_rows(rows, LIST_FIELDS)], [row.id for row in rows]
+
+
+class RecentIds:
+    """The last `size` ids added, for skipping posts a stream already sent."""
+
+    def __init__(self, size):
+        self._order = deque()
+        self._ids = set()
+        self._size = size
+
+    def add(self, pk):
+        """Adds `pk`; returns False if it was already there."""
+        if pk in self._ids:
+            return False
+        self._order.append(pk)
+        self._ids.add(pk)
+        if len(self._order) > self._size:
+            self._ids.discard(self._order.popleft())
+        return True
+
+
+async def events(last_id=None):
+    """
+    Yields the SSE stream: missed posts after `last_id` first, then new
+    posts as they are published, with a comment line every
+    POSTS_STREAM_HEARTBEAT seconds. The stream ends after
+    POSTS_STREAM_MAX_SECONDS; EventSource reconnects with Last-Event-ID.
+
+    Processes publish as their transactions commit, so live posts can
+    arrive out of id order; they are all sent, in arrival order. Replay
+    only looks past Last-Event-ID, though: a post committed after a higher
+    id while its client was disconnected is not replayed.
+    """
+    # Subscribe before replaying so nothing published in between is lost;
+    # posts both replayed and published are sent once.
+    queue = hub.open()
+    sent = RecentIds(settings.POSTS_STREAM_REPLAY_MAX + settings.POSTS_STREAM_QUEUE_SIZE)
+    try:
+        yield f"retry: {settings.POSTS_STREAM_RETRY_MS}\n\n"
+        if last_id is not None:
+            chunks, replayed = await replay(last_id)
+            for pk in replayed:
+                sent.add(pk)
+            for chunk in chunks:
+                yield chunk
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.POSTS_STREAM_MAX_SECONDS
+        while loop.time() < deadline:
+            timeout = min(settings.POSTS_STREAM_HEARTBEAT, deadline - loop.time())
+            try:
+                posts = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if posts is OVERFLOW:
+                return
+            for post in posts:
+                if sent.add(post["id"]):
+                    yield _event(post)
+    finally:
+        hub.close(queue)
@@ -1,7 +1,30 @@
+import datetime
+import gzip
+import json
+import warnings
+from io import StringIO
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from source.db_router import PIN_COOKIE
+from source.jwt_middleware import issue_tokens
+from .broker import LocalBroker
+from .cache import bump_list_version, cache, get_post, list_version, page_key, post_key, post_version, post_version_key
+from .changes import encode_changes_cursor
+from .exports import EXPORT_COLUMNS
+from .local_cache import LocalCache, TieredCache
+from .metrics import registry
 from .models import Post
+from .serializers import LIST_FIELDS, PostSerializer, post_rows, serialize_rows
+from .stream import events, publish_created
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -9,6 +32,7 @@ User = get_user_model()
 
 class PostAPITestCase(APITestCase):
     def setUp(self):
+        cache.clear()
         # Create some initial posts with user_id=1
         user = User.objects.create_user(
             username="hope",
@@ -37,3 +61,605 @@ class PostAPITestCase(APITestCase):
     def test_get_single_post_not_found(self):
         response = self.client.get(self.detail_url(999))  # non-existing post
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(POSTS_PAGE_SIZE=1)
+    def test_list_posts_cursor_pagination(self):
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p["id"] for p in response.data["results"]], [self.post2.id])
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get(self.list_url, {"cursor": response.data["next"]})
+        self.assertEqual([p["id"] for p in response.data["results"]], [self.post1.id])
+        self.assertIsNone(response.data["next"])
+
+    def test_list_posts_invalid_cursor(self):
+        response = self.client.get(self.list_url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_post_invalidates_cached_pages(self):
+        self.assertEqual(len(self.client.get(self.list_url).data["results"]), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.list_url, {"title": "Third", "content": "3", "user": 1}, format="json")
+        self.assertEqual(len(self.client.get(self.list_url).data["results"]), 3)
+
+    def test_stale_page_served_while_another_worker_rebuilds(self):
+        self.client.get(self.list_url)
+        Post.objects.create(title="Third", content="3", user=self.post1.user)
+        bump_list_version()
+
+        # Another worker holds the rebuild lock: readers get the stale page.
+        cache.add("lock:" + page_key("", settings.POSTS_PAGE_SIZE, LIST_FIELDS), "other-worker", timeout=5)
+        self.assertEqual(len(self.client.get(self.list_url).data["results"]), 2)
+
+        cache.delete("lock:" + page_key("", settings.POSTS_PAGE_SIZE, LIST_FIELDS))
+        self.assertEqual(len(self.client.get(self.list_url).data["results"]), 3)
+
+    def test_cold_miss_rebuilds_once(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return {"id": self.post1.id}
+
+        self.assertEqual(get_post(self.post1.id, build)[0], {"id": self.post1.id})
+        self.assertEqual(get_post(self.post1.id, build)[0], {"id": self.post1.id})
+        self.assertEqual(len(calls), 1)
+
+    def test_missing_post_is_negatively_cached(self):
+        self.client.get(self.detail_url(999))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url(999))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(id=999, title="Late Post", content="Content", user=self.post1.user)
+        response = self.client.get(self.detail_url(999))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_created_post_is_written_through(self):
+        payload = {"title": "New Post", "content": "Some content", "user": 1}
+        post_id = self.client.post(self.list_url, payload, format="json").data["id"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url(post_id))
+        self.assertEqual(response.data["title"], "New Post")
+
+    def test_cached_post_invalidated_on_change(self):
+        self.client.get(self.detail_url(self.post1.id))
+        self.post1.title = "Edited"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post1.save()
+        self.assertEqual(self.client.get(self.detail_url(self.post1.id)).data["title"], "Edited")
+
+        post_id = self.post1.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post1.delete()
+        response = self.client.get(self.detail_url(post_id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(POSTS_CACHE_RENDERED=True)
+    def test_rendered_cache_hit_returns_raw_json(self):
+        first = self.client.get(self.detail_url(self.post1.id))
+        with self.assertNumQueries(0):
+            hit = self.client.get(self.detail_url(self.post1.id))
+        self.assertEqual(hit.status_code, status.HTTP_200_OK)
+        self.assertEqual(hit["Content-Type"], "application/json")
+        self.assertEqual(hit.content, first.content)
+        self.assertEqual(json.loads(hit.content)["id"], self.post1.id)
+
+    @override_settings(POSTS_CACHE_RENDERED=True, POSTS_CACHE_GZIP=True, POSTS_CACHE_GZIP_MIN_SIZE=0)
+    def test_rendered_cache_gzip(self):
+        self.client.get(self.list_url)
+        response = self.client.get(self.list_url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))["results"]), 2)
+
+        response = self.client.get(self.list_url)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(len(json.loads(response.content)["results"]), 2)
+
+    def test_batch_get_posts_in_requested_order(self):
+        ids = f"{self.post2.id},999,{self.post1.id}"
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, {"ids": ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p["id"] for p in response.data["results"]], [self.post2.id, self.post1.id])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, {"ids": ids})
+        self.assertEqual([p["id"] for p in response.data["results"]], [self.post2.id, self.post1.id])
+
+    def test_cold_batch_seeds_versions_only_for_existing_posts(self):
+        cache.delete_many([post_version_key(pk) for pk in (self.post1.id, self.post2.id)])
+        self.client.get(self.list_url, {"ids": f"{self.post1.id},{self.post2.id},998,999"})
+        self.assertIsNotNone(cache.get(post_version_key(self.post1.id)))
+        self.assertIsNotNone(cache.get(post_version_key(self.post2.id)))
+        self.client.get(self.detail_url(997))
+        for pk in (997, 998, 999):
+            self.assertIsNone(cache.get(post_version_key(pk)))
+        # The negative entries still answer without a query.
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, {"ids": "998,999"})
+        self.assertEqual(response.data["results"], [])
+
+    def test_batch_get_posts_rejects_bad_ids(self):
+        response = self.client.get(self.list_url, {"ids": "1,abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_posts_reports_item_errors(self):
+        payload = [
+            {"title": "Bulk 1", "content": "c1", "user": 1},
+            {"content": "missing title", "user": 1},
+            {"title": "Bulk 2", "content": "c2", "user": 1},
+            {"title": "Unknown user", "content": "c3", "user": 999},
+        ]
+        self.client.get(self.list_url)
+        response = self.client.post(reverse("posts:posts-bulk-create"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 2)
+        self.assertEqual([e["index"] for e in response.data["errors"]], [1, 3])
+        self.assertIn("title", response.data["errors"][0]["errors"])
+        self.assertIn("user", response.data["errors"][1]["errors"])
+        self.assertEqual(len(self.client.get(self.list_url).data["results"]), 4)
+
+    def test_bulk_create_clears_cached_404s_of_every_field_set(self):
+        next_id = Post.objects.latest("id").id + 1
+        response = self.client.get(self.detail_url(next_id), {"fields": "id,title"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        payload = [{"title": "Bulk", "content": "c", "user": 1}]
+        response = self.client.post(reverse("posts:posts-bulk-create"), payload, format="json")
+        self.assertEqual(response.data["created"], [next_id])
+        response = self.client.get(self.detail_url(next_id), {"fields": "id,title"})
+        self.assertEqual(response.data, {"id": next_id, "title": "Bulk"})
+
+    def test_bulk_create_posts_from_ndjson(self):
+        body = "\n".join(json.dumps({"title": f"Line {i}", "content": "c", "user": 1}) for i in range(3))
+        response = self.client.post(
+            reverse("posts:posts-bulk-create"), body, content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.filter(title__startswith="Line ").count(), 3)
+
+    def test_post_detail_etag(self):
+        response = self.client.get(self.detail_url(self.post1.id))
+        etag = response["ETag"]
+        # Answered from the version key alone, even once the entry is gone.
+        cache.delete(post_key(self.post1.id))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url(self.post1.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.post1.title = "Edited"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post1.save()
+        response = self.client.get(self.detail_url(self.post1.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        response = self.client.get(self.detail_url(self.post1.id), HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.detail_url(999), HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_posts_list_etag_changes_on_write(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.list_url, {"page_size": "abc"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title="Third", content="3", user=self.post1.user)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_versions_are_bumped_when_the_write_commits(self):
+        pk = self.post1.id
+        before = (list_version(), post_version(pk))
+        with self.captureOnCommitCallbacks() as callbacks:
+            Post.objects.create(title="Third", content="3", user=self.post1.user)
+            self.post1.delete()
+        # A reader before the commit would cache the old rows under a new version.
+        self.assertEqual((list_version(), post_version(pk)), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(list_version(), before[0])
+        self.assertNotEqual(post_version(pk), before[1])
+
+    def test_search_posts_ranked_with_snippets(self):
+        Post.objects.create(title="Redis tips", content="Caching with redis and more redis", user=self.post1.user)
+        Post.objects.create(title="Other", content="A post that mentions redis once", user=self.post1.user)
+        response = self.client.get(reverse("posts:posts-search"), {"q": "redis"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([r["title"] for r in results], ["Redis tips", "Other"])
+        self.assertIn("<b>redis</b>", results[1]["snippet"])
+
+        Post.objects.create(title="Img", content="<img src=x onerror=alert(1)> redis & co", user=self.post1.user)
+        snippet = self.client.get(reverse("posts:posts-search"), {"q": "onerror"}).data["results"][0]["snippet"]
+        self.assertEqual(snippet, "&lt;img src=x <b>onerror</b>=alert(1)&gt; redis &amp; co")
+
+    def test_search_posts_pagination_and_updates(self):
+        for i in range(3):
+            Post.objects.create(title=f"Django {i}", content="django", user=self.post1.user)
+        url = reverse("posts:posts-search")
+        first = self.client.get(url, {"q": "djan*", "page_size": 2})
+        second = self.client.get(url, {"q": "djan*", "page_size": 2, "cursor": first.data["next"]})
+        ids = [r["id"] for r in first.data["results"] + second.data["results"]]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertIsNone(second.data["next"])
+
+        Post.objects.filter(title="Django 0").delete()
+        self.assertEqual(len(self.client.get(url, {"q": "django", "page_size": 5}).data["results"]), 2)
+
+    def test_search_index_is_written_by_the_app(self):
+        def search(q):
+            response = self.client.get(reverse("posts:posts-search"), {"q": q})
+            return [post["title"] for post in response.data["results"]]
+
+        self.client.post(
+            reverse("posts:posts-bulk-create"), [{"title": "Bulk", "content": "quokka", "user": 1}], format="json"
+        )
+        self.assertEqual(search("quokka"), ["Bulk"])
+        self.post1.title = "Renamed"
+        self.post1.save(update_fields=["title"])
+        cache.clear()
+        self.assertEqual(search("renamed"), ["Renamed"])
+
+        # posts_post has no triggers, so plain SQL writes work (and are only
+        # searchable after a rebuild).
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post (title, summary, content, view_count, user_id, created_at, updated_at) "
+                "VALUES ('Restored', '', 'wombat', 0, %s, %s, %s)",
+                [self.post1.user_id, self.post1.created_at, self.post1.created_at],
+            )
+        self.assertEqual(search("wombat"), [])
+        call_command("rebuild_post_search", stdout=StringIO())
+        cache.clear()
+        self.assertEqual(search("wombat"), ["Restored"])
+
+    def test_search_requires_query(self):
+        response = self.client.get(reverse("posts:posts-search"), {"q": '  "  '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_posts_streams_ndjson_and_csv(self):
+        export_url = reverse("posts:posts-export")
+        self.assertEqual(self.client.get(export_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        admin = User.objects.create_superuser(username="admin", email="admin@gmail.com", password="ppoopp00")
+        self.client.force_authenticate(admin)
+        response = self.client.get(export_url)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([r["id"] for r in rows], [self.post1.id, self.post2.id])
+
+        response = self.client.get(export_url, {"type": "csv", "user": 999})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(b"".join(response.streaming_content).decode().splitlines(), [",".join(EXPORT_COLUMNS)])
+
+        response = self.client.get(export_url, {"created_after": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_export_posts_streams_under_asgi(self):
+        admin = await sync_to_async(User.objects.create_superuser)(
+            username="admin", email="admin@gmail.com", password="ppoopp00"
+        )
+        access = (await sync_to_async(issue_tokens)(admin))["access"]
+        with warnings.catch_warnings():
+            # "StreamingHttpResponse must consume synchronous iterators..."
+            warnings.simplefilter("error")
+            response = await self.async_client.get(
+                reverse("posts:posts-export"), headers={"Authorization": f"JWT {access}"}
+            )
+            self.assertTrue(response.is_async)
+            body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line)["id"] for line in body.splitlines()], [self.post1.id, self.post2.id])
+
+    def test_export_posts_command(self):
+        out = StringIO()
+        call_command("export_posts", "--created-after", "2000-01-01", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+    def test_user_posts_feed(self):
+        other = User.objects.create_user(username="other", email="other@gmail.com", password="ppoopp00")
+        Post.objects.create(title="Not mine", content="c", user=other)
+        url = reverse("posts:user-posts", args=[self.post1.user_id])
+
+        response = self.client.get(url, {"page_size": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"]["post_count"], 2)
+        self.assertEqual([p["id"] for p in response.data["results"]], [self.post2.id])
+        response = self.client.get(url, {"page_size": 1, "cursor": response.data["next"]})
+        self.assertEqual([p["id"] for p in response.data["results"]], [self.post1.id])
+
+        response = self.client.get(reverse("posts:user-posts", args=[999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_post_count_follows_creates_and_deletes(self):
+        user = self.post1.user
+        payload = [{"title": f"Bulk {i}", "content": "c", "user": user.id} for i in range(3)]
+        self.client.post(reverse("posts:posts-bulk-create"), payload, format="json")
+        self.client.post(self.list_url, {"title": "One", "content": "c", "user": user.id}, format="json")
+        self.post1.delete()
+        user.refresh_from_db()
+        self.assertEqual(user.post_count, Post.objects.filter(user=user).count())
+
+    def test_sparse_fieldsets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url, {"fields": "title,id"})
+        self.assertEqual(set(response.data["results"][0]), {"id", "title"})
+        self.assertNotIn('"content"', queries.captured_queries[-1]["sql"])
+
+        response = self.client.get(self.detail_url(self.post1.id), {"fields": "id,content"})
+        self.assertEqual(response.data, {"id": self.post1.id, "content": "Content 1"})
+        # Each field set is cached on its own.
+        self.assertEqual(set(self.client.get(self.detail_url(self.post1.id)).data), set(PostSerializer.Meta.fields))
+
+        response = self.client.get(self.list_url, {"fields": "id,password"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_async_views_share_the_cache_with_sync_views(self):
+        sync_body = (await sync_to_async(self.client.get)(self.list_url)).content
+        response = await self.async_client.get(reverse("posts:async-posts-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, sync_body)
+
+        response = await self.async_client.get(reverse("posts:async-post-detail", args=[self.post1.id]))
+        self.assertEqual(json.loads(response.content)["title"], "First Post")
+        # AsyncClient only turns `headers=` into ASGI request headers.
+        response = await self.async_client.get(
+            reverse("posts:async-post-detail", args=[self.post1.id]), headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = await self.async_client.get(reverse("posts:async-post-detail", args=[999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(POSTS_BROKER="local", POSTS_STREAM_HEARTBEAT=0.05)
+    async def test_stream_replays_then_pushes_new_posts(self):
+        response = await self.async_client.get(
+            reverse("posts:posts-stream"), headers={"Last-Event-ID": str(self.post1.id)}
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b"retry:"))
+        self.assertIn(b'"title": "Second Post"', await anext(events))
+        self.assertEqual(await anext(events), b": keep-alive\n\n")
+
+        def create_post():
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(self.list_url, {"title": "Live", "content": "c", "user": 1}, format="json")
+
+        post_id = (await sync_to_async(create_post)()).data["id"]
+        chunk = await anext(events)
+        while chunk == b": keep-alive\n\n":
+            chunk = await anext(events)
+        self.assertTrue(chunk.startswith(f"id: {post_id}\nevent: post\n".encode()))
+        await events.aclose()
+
+        response = await self.async_client.get(reverse("posts:posts-stream"), {"last_event_id": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Under WSGI the stream would be buffered until it ends.
+        response = await sync_to_async(self.client.get)(reverse("posts:posts-stream"))
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    @override_settings(POSTS_BROKER="local", POSTS_STREAM_HEARTBEAT=60)
+    async def test_stream_sends_posts_published_out_of_order(self):
+        stream = events()
+        await anext(stream)  # retry:
+        # Post 11's transaction committed first.
+        for pk in (11, 10, 11, 12):
+            publish_created([{"id": pk, "title": f"Post {pk}"}])
+        self.assertEqual(
+            [(await anext(stream)).split("\n", 1)[0] for _ in range(3)], ["id: 11", "id: 10", "id: 12"]
+        )
+        await stream.aclose()
+
+    def test_warm_post_cache(self):
+        call_command("warm_post_cache", pages=2, page_size=1, posts=10, stdout=StringIO())
+        with self.assertNumQueries(0):
+            first = self.client.get(self.list_url, {"page_size": 1})
+            second = self.client.get(self.list_url, {"page_size": 1, "cursor": first.data["next"]})
+            self.client.get(self.detail_url(self.post1.id))
+        self.assertEqual(second.data["results"][0]["id"], self.post1.id)
+
+    def test_metrics_endpoint(self):
+        metrics_url = reverse("posts:posts-metrics")
+        self.assertEqual(self.client.get(metrics_url).status_code, status.HTTP_404_NOT_FOUND)
+
+        with override_settings(POSTS_METRICS_ENABLED=True):
+            before = registry.collect()[0]
+            self.client.get(self.list_url)
+            self.client.get(self.list_url)
+            after, histograms = registry.collect()
+            body = self.client.get(metrics_url).content.decode()
+
+        def delta(name, labels):
+            return after[(name, labels)] - before.get((name, labels), 0)
+
+        family = (("family", "posts:page"),)
+        self.assertEqual(delta("posts_cache_misses_total", family), 1)
+        self.assertEqual(delta("posts_cache_hits_total", family), 1)
+        self.assertEqual(delta("posts_cache_sets_total", family), 1)
+        self.assertGreater(delta("posts_db_queries_total", (("alias", "default"),)), 0)
+        self.assertIn((("view", "posts:posts-list"), ("method", "GET")), {labels for _, labels in histograms})
+        self.assertIn('posts_cache_hits_total{family="posts:page"}', body)
+        self.assertIn('posts_request_duration_seconds_bucket{view="posts:posts-list",method="GET",le="+Inf"}', body)
+
+    @override_settings(POSTS_CONTENT_COMPRESS_MIN_SIZE=1024)
+    def test_large_content_is_compressed_and_lists_return_summaries(self):
+        content = " ".join(["Lorem ipsum dolor sit amet."] * 100 + ["zebracorn"])
+        response = self.client.post(self.list_url, {"title": "Long", "content": content, "user": 1}, format="json")
+        self.assertEqual(response.data["content"], content)
+        post_id = response.data["id"]
+        stored = Post.objects.filter(pk=post_id).values("content", "content_zlib", "summary").get()
+        self.assertEqual(stored["content"], "")
+        self.assertLess(len(stored["content_zlib"]), len(content))
+        self.assertTrue(stored["summary"].startswith("Lorem ipsum") and stored["summary"].endswith("…"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url)
+        self.assertEqual(set(response.data["results"][0]), set(LIST_FIELDS))
+        self.assertNotIn("content", queries.captured_queries[-1]["sql"])
+
+        cache.clear()
+        response = self.client.get(self.detail_url(post_id))
+        self.assertEqual(response.data["content"], content)
+        self.assertEqual(Post.objects.get(pk=post_id).content, content)
+        # Compressed posts are indexed on their full body.
+        response = self.client.get(reverse("posts:posts-search"), {"q": "zebracorn"})
+        self.assertEqual([post["id"] for post in response.data["results"]], [post_id])
+        self.assertIn("zebracorn", response.data["results"][0]["snippet"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.get(pk=post_id).delete()
+        self.assertEqual(self.client.get(reverse("posts:posts-search"), {"q": "zebracorn"}).data["results"], [])
+
+    def test_view_counts_are_written_behind(self):
+        self.client.get(self.detail_url(self.post1.id))
+        etag = self.client.get(self.detail_url(self.post1.id))["ETag"]
+        self.client.get(self.detail_url(self.post1.id), HTTP_IF_NONE_MATCH=etag)
+        self.client.get(self.detail_url(self.post2.id))
+        self.client.get(self.detail_url(999))
+        self.post1.refresh_from_db()
+        self.assertEqual(self.post1.view_count, 0)
+
+        response = self.client.get(reverse("posts:posts-most-viewed"))
+        self.assertEqual(
+            [(post["id"], post["views"]) for post in response.data["results"]],
+            [(self.post1.id, 3), (self.post2.id, 1)],
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command("flush_post_views", stdout=StringIO())
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            dict(Post.objects.values_list("id", "view_count")), {self.post1.id: 3, self.post2.id: 1}
+        )
+        self.client.get(self.detail_url(self.post1.id))
+        call_command("flush_post_views", stdout=StringIO())
+        self.post1.refresh_from_db()
+        self.assertEqual(self.post1.view_count, 4)
+
+    @override_settings(POSTS_CHANGES_SETTLE_SECONDS=0)
+    def test_changes_since_cursor(self):
+        changes_url = reverse("posts:posts-changes")
+        response = self.client.get(changes_url, {"page_size": 1})
+        self.assertEqual([post["id"] for post in response.data["changed"]], [self.post1.id])
+        self.assertTrue(response.data["has_more"])
+        response = self.client.get(changes_url, {"page_size": 1, "since": response.data["cursor"]})
+        self.assertEqual([post["id"] for post in response.data["changed"]], [self.post2.id])
+        self.assertFalse(response.data["has_more"])
+        cursor = response.data["cursor"]
+
+        response = self.client.get(changes_url, {"since": cursor})
+        self.assertEqual((response.data["changed"], response.data["deleted"]), ([], []))
+
+        self.post1.title = "First Post, edited"
+        self.post1.save()
+        post2_id = self.post2.id
+        self.post2.delete()
+        response = self.client.get(changes_url, {"since": cursor})
+        self.assertEqual([post["title"] for post in response.data["changed"]], ["First Post, edited"])
+        self.assertEqual(response.data["deleted"], [post2_id])
+
+        cursor = response.data["cursor"]
+        response = self.client.get(changes_url, {"since": cursor})
+        self.assertEqual((response.data["changed"], response.data["deleted"]), ([], []))
+        self.assertEqual(self.client.get(changes_url, {"since": "nope"}).status_code, status.HTTP_400_BAD_REQUEST)
+        naive = encode_changes_cursor(datetime.datetime(2020, 1, 1), 0, datetime.datetime(2026, 10, 18), 0)
+        self.assertEqual(self.client.get(changes_url, {"since": naive}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Partial saves move updated_at as well.
+        self.post1.title = "First Post, edited again"
+        self.post1.save(update_fields=["title"])
+        response = self.client.get(changes_url, {"since": cursor})
+        self.assertEqual([post["title"] for post in response.data["changed"]], ["First Post, edited again"])
+
+    def test_fast_serialization_matches_post_serializer(self):
+        renderer = JSONRenderer()
+        queryset = Post.objects.order_by("id")
+        for fields in (None, ("id", "title"), ("user", "created_at")):
+            with self.subTest(fields=fields), override_settings(TIME_ZONE="Asia/Kolkata"):
+                expected = renderer.render(PostSerializer(queryset, many=True, fields=fields).data)
+                self.assertEqual(renderer.render(serialize_rows(post_rows(queryset, fields), fields)), expected)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTestCase(TransactionTestCase):
+    """
+    "default" and "replica" are two separate SQLite databases here, and
+    nothing replicates between them, so the data tells where a read went.
+    """
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="hope", email="hope@gmail.com", password="ppoopp00")
+        self.post = Post.objects.create(title="Primary", content="Content", user=self.user)
+        self.user.save(using="replica")
+        Post(id=self.post.id, title="Replica", content="Content", user=self.user).save(using="replica")
+        # After the writes, which leave their versions marked as just bumped.
+        cache.clear()
+
+    def test_reads_go_to_the_replica_until_the_client_writes(self):
+        response = self.client.get(reverse("posts:post-detail", args=[self.post.id]))
+        self.assertEqual(response.data["title"], "Replica")
+        self.assertIsNone(User.objects.get_user_by_username("nobody"))
+        self.assertEqual(User.objects.get_user_by_username("hope").id, self.user.id)
+
+        response = self.client.post(
+            reverse("posts:posts-list"), {"title": "New", "content": "New", "user": self.user.id}
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        # Only the primary has the new post; the pin cookie sends us there.
+        cache.clear()
+        response = self.client.get(reverse("posts:post-detail", args=[response.data["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        del self.client.cookies[PIN_COOKIE]
+        response = self.client.get(reverse("posts:post-detail", args=[self.post.id]))
+        self.assertEqual(response.data["title"], "Replica")
+
+    def test_rebuilds_after_a_write_read_from_the_primary(self):
+        response = self.client.post(
+            reverse("posts:posts-list"), {"title": "New", "content": "New", "user": self.user.id}
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        # An unpinned reader rebuilds the list first; it must not cache the
+        # replica's copy, which lacks the post, under the new version.
+        response = self.client_class().get(reverse("posts:posts-list"))
+        self.assertEqual([post["title"] for post in response.data["results"]], ["New", "Primary"])
+        response = self.client.get(reverse("posts:posts-list"))
+        self.assertEqual([post["title"] for post in response.data["results"]], ["New", "Primary"])
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        remote = LocMemCache("tiered-cache-tests", {})
+        remote.clear()
+        broker = LocalBroker()
+        # Two worker processes sharing one Redis and one pub/sub channel.
+        self.worker_a = TieredCache(remote, lambda: broker, local=LocalCache(max_entries=2, ttl=60))
+        self.worker_b = TieredCache(remote, lambda: broker, local=LocalCache(max_entries=2, ttl=60))
+
+    def test_local_tier_serves_repeated_reads(self):
+        self.worker_a.set("post:1", "v1")
+        self.assertEqual(self.worker_b.get("post:1"), "v1")
+        self.assertEqual(self.worker_b.get("post:1"), "v1")
+        stats = self.worker_b.stats()
+        self.assertEqual(stats["local"]["hits"], 1)
+        self.assertEqual(stats["remote"]["hits"], 1)
+
+    def test_write_evicts_other_workers_local_copy(self):
+        self.worker_a.set("post:1", "v1")
+        self.assertEqual(self.worker_b.get("post:1"), "v1")
+        self.worker_a.set("post:1", "v2")
+        self.assertEqual(self.worker_b.get("post:1"), "v2")
+        self.worker_a.delete("post:1")
+        self.assertIsNone(self.worker_b.get("post:1"))
+
+    def test_local_tier_is_bounded(self):
+        for i in range(3):
+            self.worker_a.set(f"post:{i}", i)
+        self.assertEqual(len(self.worker_a._local), 2)
@@ -1,9 +1,20 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path("api/posts/", views.posts_list, name="posts-list"),
+    path("api/posts/bulk/", views.posts_bulk_create, name="posts-bulk-create"),
+    path("api/posts/search", views.posts_search, name="posts-search"),
+    path("api/posts/changes", views.posts_changes, name="posts-changes"),
+    path("api/posts/most-viewed", views.posts_most_viewed, name="posts-most-viewed"),
+    path("api/posts/export", views.posts_export, name="posts-export"),
     path("api/posts/<int:pk>", views.post_detail, name="post-detail"),
+    path("api/users/<int:user_id>/posts/", views.user_posts, name="user-posts"),
+    path("api/async/posts/", async_views.posts_list, name="async-posts-list"),
+    path("api/async/posts/<int:pk>", async_views.post_detail, name="async-post-detail"),
+    path("api/posts/stream", async_views.posts_stream, name="posts-stream"),
+    path("api/posts/cache/stats", views.cache_stats, name="posts-cache-stats"),
+    path("api/posts/metrics", views.metrics, name="posts-metrics"),
 ]
\ No newline at end of file
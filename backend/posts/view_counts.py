@@ -0,0 +1,88 @@
+"""
+Write-behind post view counters.
+
+Every read of a post bumps three Redis structures in one pipelined round
+trip: a per-post pending counter, the set of posts with pending counts,
+and the all-time ranking behind the most viewed endpoint. flush() later
+moves the pending counts into posts_post.view_count with batched UPDATEs,
+so reads never write to the database.
+"""
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django_redis import get_redis_connection
+from .models import Post
+
+PENDING_KEY = "posts:views:{}"
+DIRTY_KEY = "posts:views:dirty"
+RANKING_KEY = "posts:views:ranking"
+
+
+def _pending_key(pk):
+    return PENDING_KEY.format(pk)
+
+
+def _record(pipeline, pk):
+    pipeline.incr(_pending_key(pk))
+    pipeline.sadd(DIRTY_KEY, pk)
+    pipeline.zincrby(RANKING_KEY, 1, pk)
+
+
+def record_view(pk):
+    pipeline = get_redis_connection("default").pipeline(transaction=False)
+    _record(pipeline, pk)
+    pipeline.execute()
+
+
+async def arecord_view(client, pk):
+    """record_view() for the async views, on their redis.asyncio client."""
+    pipeline = client.pipeline(transaction=False)
+    _record(pipeline, pk)
+    await pipeline.execute()
+
+
+def forget(pk):
+    get_redis_connection("default").zrem(RANKING_KEY, pk)
+
+
+def most_viewed(limit):
+    """[(pk, views)] of the most viewed posts, most viewed first."""
+    ranking = get_redis_connection("default").zrevrange(RANKING_KEY, 0, limit - 1, withscores=True)
+    return [(int(pk), int(views)) for pk, views in ranking]
+
+
+def flush(batch_size=500):
+    """
+    Adds the pending counts to view_count, batch_size posts per UPDATE, and
+    trims the ranking to its POSTS_VIEW_RANKING_SIZE best entries. Returns
+    the number of views written.
+
+    Each pending counter is read and deleted in one GETDEL, so views that
+    arrive during a flush are kept for the next one. A batch whose UPDATE
+    fails is put back.
+    """
+    redis = get_redis_connection("default")
+    written = 0
+    while True:
+        pks = redis.spop(DIRTY_KEY, batch_size)
+        if not pks:
+            break
+        pipeline = redis.pipeline(transaction=False)
+        for pk in pks:
+            pipeline.getdel(_pending_key(int(pk)))
+        counts = {int(pk): int(count) for pk, count in zip(pks, pipeline.execute()) if count}
+        if not counts:
+            continue
+        try:
+            Post.objects.filter(pk__in=counts).update(
+                view_count=F("view_count") + Case(*(When(pk=pk, then=Value(n)) for pk, n in counts.items()))
+            )
+        except Exception:
+            pipeline = redis.pipeline(transaction=False)
+            for pk, count in counts.items():
+                pipeline.incrby(_pending_key(pk), count)
+                pipeline.sadd(DIRTY_KEY, pk)
+            pipeline.execute()
+            raise
+        written += sum(counts.values())
+    redis.zremrangebyrank(RANKING_KEY, 0, -settings.POSTS_VIEW_RANKING_SIZE - 1)
+    return written
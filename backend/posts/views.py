@@ -1,46 +1,357 @@
-import json
-from django.core.cache import cache
-from rest_framework.decorators import api_view
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from .cache import (
+    bump_list_version, cache, get_page, get_post, get_posts, get_search_page, get_user_page, list_version,
+    peek_post_version, post_key, post_version, seed_post_versions, store,
+)
+from .changes import CHANGES_FIELDS, ExpiredCursor, get_changes
+from .content import unpack
+from .exports import CONTENT_TYPES, aiter_export, export_rows, iter_export, parse_filters
+from .metrics import registry
 from .models import Post
-from .serializers import PostSerializer
+from .parsers import NDJSONParser
+from .pagination import InvalidCursor, get_page_size, paginate
+from .rendering import not_modified, prepare, respond, respond_many, set_etag
+from .search import build_match_query, search_posts
+from .search_index import index_posts
+from .stream import publish_created
+from .view_counts import most_viewed, record_view
+from .serializers import (
+    LIST_FIELDS, BulkPostSerializer, InvalidFields, PostSearchSerializer, PostSerializer, parse_fields, post_rows,
+    serialize_rows,
+)
+
+User = get_user_model()
 
 
 @api_view(["GET", "POST"])
 def posts_list(request):
     if request.method == "GET":
-        cached_posts = cache.get("posts")
-        if cached_posts:
-            return Response(cached_posts, status=status.HTTP_200_OK)
+        if "ids" in request.query_params:
+            return posts_batch(request)
+
+        try:
+            fields = parse_fields(request.query_params.get("fields"), default=LIST_FIELDS)
+            page_size = get_page_size(request.query_params.get("page_size"))
+        except (InvalidCursor, InvalidFields) as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.META.get("HTTP_IF_NONE_MATCH"):
+            response = not_modified(request, f"posts-{list_version()}")
+            if response is not None:
+                return response
+
+        cursor = request.query_params.get("cursor", "")
 
-        posts = Post.objects.all().order_by("-created_at")
-        serializer = PostSerializer(posts, many=True)
-        cache.set("posts", serializer.data)  # uses default TIMEOUT from settings
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def build_page():
+            rows, next_cursor = paginate(post_rows(Post.objects.all(), fields), cursor, page_size)
+            return prepare({"next": next_cursor, "results": serialize_rows(rows, fields)})
+
+        try:
+            page, version = get_page(cursor, page_size, build_page, fields)
+        except (InvalidCursor, InvalidFields) as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return set_etag(respond(request, page, status.HTTP_200_OK), f"posts-{version}")
 
     elif request.method == "POST":
         serializer = PostSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
-            cache.delete("posts")  # invalidate cache
+            with transaction.atomic():
+                post = serializer.save()  # signals bump post_count and mark cached pages stale
+                created = {name: serializer.data[name] for name in LIST_FIELDS}
+                transaction.on_commit(lambda: publish_created([created]))
+            # Write-through, so the first read of the new post is a cache hit.
+            store(post_key(post.pk), prepare(serializer.data), version=post_version(post.pk))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def posts_batch(request):
+    """
+    GET v1/api/posts/?ids=3,1,2 returns the existing posts among `ids`, in
+    the requested order, with one cache round trip and at most one query.
+    """
+    try:
+        pks = list(dict.fromkeys(int(pk) for pk in request.query_params["ids"].split(",") if pk.strip()))
+    except ValueError:
+        return Response({"detail": "ids must be a comma separated list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        fields = parse_fields(request.query_params.get("fields"))
+    except InvalidFields as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if len(pks) > settings.POSTS_BATCH_MAX_IDS:
+        return Response(
+            {"detail": f"At most {settings.POSTS_BATCH_MAX_IDS} ids per request."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Every post write bumps the collection version, so it validates any
+    # selection of posts as well.
+    version = list_version()
+    response = not_modified(request, f"posts-{version}")
+    if response is not None:
+        return response
+
+    def build_many(missing):
+        rows = list(post_rows(Post.objects.filter(id__in=missing), fields))
+        return {row.id: prepare(data) for row, data in zip(rows, serialize_rows(rows, fields))}
+
+    found = get_posts(pks, build_many, fields)
+    response = respond_many(request, [found[pk] for pk in pks if pk in found], status.HTTP_200_OK)
+    return set_etag(response, f"posts-{version}")
+
+
 @api_view(["GET"])
 def post_detail(request, pk):
-    cache_key = f"post:{pk}"
-    cached_post = cache.get(cache_key)
+    try:
+        fields = parse_fields(request.query_params.get("fields"))
+    except InvalidFields as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    if cached_post:
-        return Response(cached_post, status=status.HTTP_200_OK)
+    # Version keys only exist for posts that were found, and a delete bumps
+    # the version, so a matching ETag is answered without the entry. "*"
+    # needs the lookup below to tell whether the post exists.
+    if request.META.get("HTTP_IF_NONE_MATCH"):
+        version = peek_post_version(pk)
+        response = not_modified(request, f"post-{pk}-{version}", wildcard=False) if version is not None else None
+        if response is not None:
+            record_view(pk)
+            return response
 
-    try:
-        post = Post.objects.get(pk=pk)
-    except Post.DoesNotExist:
+    def build_post():
+        try:
+            row = post_rows(Post.objects.all(), fields).get(pk=pk)
+        except Post.DoesNotExist:
+            return None
+        return prepare(serialize_rows([row], fields)[0])
+
+    data, version = get_post(pk, build_post, fields)
+    if data is None:
         return Response({"detail": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
+    record_view(pk)
+    response = not_modified(request, f"post-{pk}-{version}")
+    if response is not None:
+        return response
+    return set_etag(respond(request, data, status.HTTP_200_OK), f"post-{pk}-{version}")
+
+
+@api_view(["GET"])
+def user_posts(request, user_id):
+    """
+    GET v1/api/users/<id>/posts/ is a user's feed, newest first, headed by
+    the user's denormalized post_count.
+    """
+    try:
+        page_size = get_page_size(request.query_params.get("page_size"))
+    except InvalidCursor as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.META.get("HTTP_IF_NONE_MATCH"):
+        response = not_modified(request, f"posts-{list_version()}")
+        if response is not None:
+            return response
+
+    cursor = request.query_params.get("cursor", "")
+
+    def build_page():
+        user = User.objects.filter(pk=user_id).values("id", "username", "post_count").first()
+        if user is None:
+            return None
+        rows, next_cursor = paginate(post_rows(Post.objects.filter(user_id=user_id), LIST_FIELDS), cursor, page_size)
+        return prepare({"user": user, "next": next_cursor, "results": serialize_rows(rows, LIST_FIELDS)})
+
+    try:
+        page, version = get_user_page(user_id, cursor, page_size, build_page)
+    except InvalidCursor as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if page is None:
+        return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+    return set_etag(respond(request, page, status.HTTP_200_OK), f"posts-{version}")
+
+
+@api_view(["GET"])
+def posts_changes(request):
+    """
+    GET v1/api/posts/changes?since= returns the posts created or updated and
+    the ids of the posts deleted after the `since` cursor, with the cursor
+    to send next time. Clients keep polling while has_more is true.
+    """
+    try:
+        fields = parse_fields(request.query_params.get("fields"), default=CHANGES_FIELDS)
+        page_size = get_page_size(request.query_params.get("page_size"))
+        changes = get_changes(request.query_params.get("since", ""), page_size, fields)
+    except ExpiredCursor as e:
+        return Response({"detail": str(e)}, status=status.HTTP_410_GONE)
+    except (InvalidCursor, InvalidFields) as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(changes, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+def posts_most_viewed(request):
+    """
+    GET v1/api/posts/most-viewed?limit= lists the most viewed posts from the
+    Redis ranking, with their view counts.
+    """
+    try:
+        limit = get_page_size(request.query_params.get("limit"))
+    except InvalidCursor:
+        return Response({"detail": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+    ranking = most_viewed(limit)
+    rows = {row.id: row for row in post_rows(Post.objects.filter(id__in=[pk for pk, _ in ranking]), LIST_FIELDS)}
+    results = []
+    for pk, views in ranking:
+        if pk in rows:
+            results.append({**serialize_rows([rows[pk]], LIST_FIELDS)[0], "views": views})
+    return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+def posts_search(request):
+    """
+    GET v1/api/posts/search?q= ranks posts by bm25 over title and content
+    using the FTS5 index, with cursor pagination and a content snippet.
+    """
+    match = build_match_query(request.query_params.get("q", ""))
+    if not match:
+        return Response({"detail": "q is required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        page_size = get_page_size(request.query_params.get("page_size"))
+    except InvalidCursor as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.META.get("HTTP_IF_NONE_MATCH"):
+        response = not_modified(request, f"posts-{list_version()}")
+        if response is not None:
+            return response
+
+    cursor = request.query_params.get("cursor", "")
+
+    def build_page():
+        posts, next_cursor = search_posts(match, cursor, page_size)
+        return prepare({"next": next_cursor, "results": PostSearchSerializer(posts, many=True).data})
+
+    try:
+        page, version = get_search_page(match, cursor, page_size, build_page)
+    except InvalidCursor as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return set_etag(respond(request, page, status.HTTP_200_OK), f"posts-{version}")
+
+
+@api_view(["POST"])
+@parser_classes([JSONParser, NDJSONParser])
+def posts_bulk_create(request):
+    """
+    Creates many posts from a JSON array or an NDJSON body.
+
+    Invalid items are reported by index and skipped; the valid ones are
+    inserted with bulk_create in one transaction, and the list cache is
+    invalidated once for the whole batch.
+    """
+    items = request.data
+    if not isinstance(items, list):
+        return Response({"detail": "Expected a list of posts."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > settings.POSTS_BULK_MAX_ITEMS:
+        return Response(
+            {"detail": f"At most {settings.POSTS_BULK_MAX_ITEMS} posts per request."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    validator = BulkPostSerializer()
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, validator.run_validation(item)))
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.detail})
+
+    user_ids = set(User.objects.filter(id__in={data["user"] for _, data in valid}).values_list("id", flat=True))
+    posts = []
+    for index, data in valid:
+        if data["user"] not in user_ids:
+            errors.append({"index": index, "errors": {"user": [f'Invalid pk "{data["user"]}" - object does not exist.']}})
+            continue
+        post = Post(title=data["title"], content=data["content"], user_id=data["user"])
+        post.pack_content()
+        posts.append(post)
+    errors.sort(key=lambda error: error["index"])
+
+    if not posts:
+        return Response({"created": [], "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        Post.objects.bulk_create(posts, batch_size=settings.POSTS_BULK_BATCH_SIZE)
+        index_posts((post.pk, post.title, unpack(post.content, post.content_zlib)) for post in posts)
+        created = PostSerializer(posts, many=True, fields=LIST_FIELDS).data
+        transaction.on_commit(lambda: publish_created(created))
+        per_user = {}
+        for post in posts:
+            per_user[post.user_id] = per_user.get(post.user_id, 0) + 1
+        for user_id, count in per_user.items():
+            User.objects.filter(pk=user_id).update(post_count=F("post_count") + count)
+
+    # bulk_create sends no signals: drop cached 404s for the new ids, give
+    # them versions so the 404s cached for other field sets (under version
+    # None) stop matching too, and mark the list stale once for the batch.
+    cache.delete_many([post_key(post.pk) for post in posts])
+    seed_post_versions([post.pk for post in posts])
+    bump_list_version()
+    return Response({"created": [post.pk for post in posts], "errors": errors}, status=status.HTTP_201_CREATED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def posts_export(request):
+    """
+    GET v1/api/posts/export?type=ndjson|csv&user=&created_after=&created_before=
+    streams matching posts straight from a chunked database cursor. (DRF
+    reserves ?format= for renderer selection.) Under ASGI the lines are
+    handed over as an async iterator, or Django would buffer them all.
+    """
+    fmt = request.query_params.get("type", "ndjson")
+    if fmt not in CONTENT_TYPES:
+        return Response({"detail": "type must be ndjson or csv."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        filters = parse_filters(
+            request.query_params.get("user"),
+            request.query_params.get("created_after"),
+            request.query_params.get("created_before"),
+        )
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    lines = iter_export(fmt, export_rows(filters))
+    if isinstance(request._request, ASGIRequest):
+        lines = aiter_export(lines)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="posts.{fmt}"'
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """
+    Hit ratios of the in-process and Redis tiers for this worker process.
+    """
+    return Response(cache.stats(), status=status.HTTP_200_OK)
+
 
-    serializer = PostSerializer(post)
-    cache.set(cache_key, serializer.data)  # uses default TIMEOUT
-    return Response(serializer.data, status=status.HTTP_200_OK)
+def metrics(request):
+    """
+    Prometheus text exposition of this worker process' metrics. Only
+    served when POSTS_METRICS_ENABLED is on.
+    """
+    if not settings.POSTS_METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
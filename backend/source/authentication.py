@@ -0,0 +1,99 @@
+"""
+Stateless JWT authentication for the API.
+
+The access tokens issued at login already carry id, username, is_admin
+and is_staff, so request.user is built from the verified claims instead
+of a CustomUser query on every request. The row is loaded the first time
+a view reads anything the claims do not have (request.user.email, say).
+
+Signature checks are cached per raw token in a small LRU; a cached token
+is still rejected once its exp has passed.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+User = get_user_model()
+
+
+class ClaimsUser(TokenUser):
+    """request.user for JWTClaimsAuthentication."""
+
+    @cached_property
+    def is_admin(self):
+        return self.token.get("is_admin", False)
+
+    @cached_property
+    def is_staff(self):
+        # Tokens issued before the claim existed fall back to the row.
+        if "is_staff" in self.token:
+            return self.token["is_staff"]
+        return self.row.is_staff
+
+    @cached_property
+    def row(self):
+        """
+        The CustomUser behind the token, loaded on first use. A user deleted
+        while the token is still valid fails authentication (401).
+        """
+        try:
+            return User.objects.get(pk=self.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.row, attr)
+
+
+class VerifiedTokens:
+    """Thread-safe LRU of validated tokens keyed by the raw token."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = OrderedDict()
+
+    def get(self, raw_token):
+        with self._lock:
+            token = self._tokens.get(raw_token)
+            if token is None:
+                return None
+            if token["exp"] <= time.time():
+                del self._tokens[raw_token]
+                return None
+            self._tokens.move_to_end(raw_token)
+            return token
+
+    def add(self, raw_token, token):
+        with self._lock:
+            self._tokens[raw_token] = token
+            self._tokens.move_to_end(raw_token)
+            while len(self._tokens) > settings.JWT_AUTH_CACHE_SIZE:
+                self._tokens.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+
+verified_tokens = VerifiedTokens()
+
+
+class JWTClaimsAuthentication(JWTStatelessUserAuthentication):
+    """Builds SIMPLE_JWT["TOKEN_USER_CLASS"] (ClaimsUser) from cached, verified tokens."""
+
+    def get_validated_token(self, raw_token):
+        token = verified_tokens.get(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            verified_tokens.add(raw_token, token)
+        return token
@@ -0,0 +1,103 @@
+"""
+Primary/replica database routing.
+
+Reads go to one of the DATABASE_REPLICAS aliases and writes to "default".
+Once a request writes, its remaining reads stay on the primary, and the
+client gets a cookie that keeps its next requests there for
+DATABASE_REPLICA_PIN_SECONDS, long enough for the replicas to catch up.
+
+The pin does not cover the shared posts cache: any client may rebuild an
+entry, so for the same window after a write posts.cache runs rebuilds
+under use_primary().
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PRIMARY = "default"
+PIN_COOKIE = "db_pin_primary"
+
+# Per request {"pinned": bool, "wrote": bool}; None outside a request.
+_state = ContextVar("db_routing_state", default=None)
+
+
+def pinned_to_primary():
+    state = _state.get()
+    return state is not None and state["pinned"]
+
+
+@contextmanager
+def use_primary():
+    """Sends the reads made inside the block to the primary."""
+    outer = _state.get()
+    state = {"pinned": True, "wrote": False}
+    token = _state.set(state)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+        if outer is not None and state["wrote"]:
+            outer["pinned"] = outer["wrote"] = True
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or pinned_to_primary():
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state["pinned"] = state["wrote"] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+
+class ReplicaPinningMiddleware:
+    """
+    Sets up the routing state of each request: pinned from the start when
+    the client still has the pin cookie, and the cookie is (re)issued when
+    the request wrote to the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        state = {"pinned": PIN_COOKIE in request.COOKIES, "wrote": False}
+        return state, _state.set(state)
+
+    def finish(self, state, response):
+        if state["wrote"]:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True, samesite="Lax",
+            )
+        return response
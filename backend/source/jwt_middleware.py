@@ -1,49 +1,80 @@
 
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.views import TokenObtainPairView
+import time
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
+from accounts.hashers import HashingBusy, verify_password
 from accounts.utils import resend_otp_func
-from rest_framework_simplejwt.tokens import AccessToken    
+from rest_framework_simplejwt.tokens import RefreshToken
 import ast
-from django.http import QueryDict
+from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
+from django.utils import timezone
+from django_redis import get_redis_connection
 # from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
+REVOKED_KEY = "jwt:revoked:{}"
+
+
+def issue_tokens(user):
+    """
+    A short-lived access token and a refresh token for `user`. The access
+    token carries the claims JWTClaimsAuthentication builds request.user
+    from.
+    """
+    refresh = RefreshToken.for_user(user)
+    refresh['id'] = user.id
+    refresh["username"] = user.username
+    refresh["is_admin"] = user.is_admin
+    refresh["is_staff"] = user.is_staff
+    return {
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+    }
+
+
+def revoke(token):
+    """
+    Puts the token's jti on the revocation list in Redis until the token
+    would have expired anyway. Returns False when it was already there.
+    """
+    ttl = max(int(token["exp"] - time.time()), 1)
+    key = REVOKED_KEY.format(token[api_settings.JTI_CLAIM])
+    return bool(get_redis_connection("default").set(key, 1, nx=True, ex=ttl))
+
 
 class CustomAuthBackend(BaseBackend):
     def authenticate(self,isGoogleAuth=False, username=None, password=None):
         # Implement your custom authentication logic here
         # For example, check if a one-time token sent via email is valid
-        user = User.objects.just_get_user_by_username(username)
-        if not user: 
-            user = User.objects.get_user_by_email(username)
+        user = User.objects.get_user_for_login(username)
 
         if not user:
             raise ValueError({"message":"Invalid credentials. Please try again.","code":"400"})
             
         
+        rehashed = False
         if not isGoogleAuth:
             if not password:
                 raise ValueError({"message":"Password Required.","code":"400"})
             
-            if not user.check_password(password):
+            valid, rehashed = verify_password(user, password)
+            if not valid:
                 raise ValueError({"message":"Incorrect password. Please try with right credentials.", "email": username,"code":"404"})
         
         if not user.is_active:
             resend_otp_func(subject="Account Verification OTP - PlayApp",email=user.email,purpose="verify_account")
             raise Exception({"message":"INACTIVE. This user exists but it's not verified yet. We have sent OTP on linked email of this account. Please Verify.","email":user.email,"code":"505"}) 
 
-        access_token = AccessToken.for_user(user)
-        access_token['id'] = user.id
-        access_token["username"] = user.username
-        access_token["is_admin"] = user.is_admin
-        User.objects.custom_save(user)
-        return ({
-            'access': str(access_token),
-            'refresh': str(access_token)
-        })
+        user.last_login = timezone.now()
+        # A hash upgraded by verify_password() goes out in the same UPDATE.
+        user.save(update_fields=["last_login", "password"] if rehashed else ["last_login"])
+        return issue_tokens(user)
         
 
 class MyTokenObtainPairView(TokenObtainPairView):
@@ -51,11 +82,8 @@ class MyTokenObtainPairView(TokenObtainPairView):
 
     def post(self, request, *args, **kwargs):
 
-        data = QueryDict('', mutable=True)
-        data.update(request.data)
-        data = data.dict()
-        username = data.get("username", None)
-        password = data.get("password", None)
+        username = request.data.get("username", None)
+        password = request.data.get("password", None)
 
         if not username :
             return Response({"message":"Username required."},status=400)
@@ -64,15 +92,35 @@ class MyTokenObtainPairView(TokenObtainPairView):
             return Response({"message":"Username required."},status=400)
         
         username = username.lower().strip()
-        print(username,password)
         try:
             data = CustomAuthBackend().authenticate(isGoogleAuth=False,username=username,password=password)
             return Response(data, status=200)
+        except HashingBusy as e:
+            return Response(
+                {"message": str(e)}, status=503, headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER)}
+            )
         except Exception as e:
-            print(e)
             try:
                 error_dict = ast.literal_eval(str(e))
                 # print(error_dict.get('code',401))
                 return Response(error_dict, status=error_dict.get('code',401))
             except Exception:
-                return Response({"message":"Unexcepted Error."}, status=400)
\ No newline at end of file
+                return Response({"message":"Unexcepted Error."}, status=400)
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        # Revoking is a SET NX, so of two requests with the same refresh
+        # token only one gets new tokens.
+        if not revoke(refresh):
+            raise InvalidToken("Token has already been used.")
+        user = User.objects.get_user_by_id(refresh.get(api_settings.USER_ID_CLAIM))
+        if not user or not user.is_active:
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        # Fresh claims, in case the user changed since the last login.
+        return issue_tokens(user)
+
+
+class MyTokenRefreshView(TokenRefreshView):
+    serializer_class = RotatingTokenRefreshSerializer
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 MIDDLEWARE = [
+    'posts.metrics.MetricsMiddleware',
+    'source.db_router.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,9 +97,20 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Read replica; only used when listed in DATABASE_REPLICAS.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': config("DATABASE_REPLICA_NAME", default=str(BASE_DIR / 'db.replica.sqlite3')),
+    },
 }
 
+# Reads go to DATABASE_REPLICAS (if any), writes to default. After a write
+# the client reads from default for DATABASE_REPLICA_PIN_SECONDS.
+DATABASE_ROUTERS = ["source.db_router.PrimaryReplicaRouter"]
+DATABASE_REPLICAS = config("DATABASE_REPLICAS", default="", cast=Csv())
+DATABASE_REPLICA_PIN_SECONDS = config("DATABASE_REPLICA_PIN_SECONDS", default=5, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -117,6 +130,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing. New hashes use PASSWORD_HASHER ("pbkdf2" or "argon2",
+# which needs argon2-cffi); hashes made by the other one, or with other
+# costs, are upgraded on the next successful login.
+_PASSWORD_HASHERS = {
+    "pbkdf2": "accounts.hashers.PBKDF2PasswordHasher",
+    "argon2": "accounts.hashers.Argon2PasswordHasher",
+}
+PASSWORD_HASHER = config("PASSWORD_HASHER", default="pbkdf2")
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + [
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PASSWORD_PBKDF2_ITERATIONS = config("PASSWORD_PBKDF2_ITERATIONS", default=600_000, cast=int)
+PASSWORD_ARGON2_TIME_COST = config("PASSWORD_ARGON2_TIME_COST", default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config("PASSWORD_ARGON2_MEMORY_COST", default=102_400, cast=int)
+PASSWORD_ARGON2_PARALLELISM = config("PASSWORD_ARGON2_PARALLELISM", default=8, cast=int)
+# Hashing runs on PASSWORD_HASH_WORKERS processes (0 runs it inline). Past
+# PASSWORD_HASH_MAX_PENDING hashes in flight, logins get a 503.
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=2, cast=int)
+PASSWORD_HASH_MAX_PENDING = config("PASSWORD_HASH_MAX_PENDING", default=16, cast=int)
+PASSWORD_HASH_RETRY_AFTER = config("PASSWORD_HASH_RETRY_AFTER", default=1, cast=int)
+
 # Cors Headers Settings
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_HEADERS = [
@@ -150,12 +188,27 @@ CORS_ORIGIN_WHITELIST = [
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT',),
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=7),
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=config("JWT_ACCESS_TOKEN_MINUTES", default=15, cast=int)),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=65),
     "USER_ID_FIELD": "id",
-    'BLACKLIST_AFTER_ROTATION': True,
+    # v1/api/token/refresh/ always rotates; used refresh tokens are revoked
+    # in Redis (source.jwt_middleware.revoke), not by the blacklist app.
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': False,
     "SIGNING_KEY":"signed_key_test",
+    "TOKEN_USER_CLASS": "source.authentication.ClaimsUser",
+}
+
+# API requests authenticate from the access token's claims alone (see
+# source/authentication.py); the admin keeps using sessions.
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "source.authentication.JWTClaimsAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+    ],
 }
+# Verified access tokens kept in each process's LRU.
+JWT_AUTH_CACHE_SIZE = config("JWT_AUTH_CACHE_SIZE", default=1024, cast=int)
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -198,3 +251,63 @@ CACHES = {
     }
 }
 
+# Posts list pagination
+POSTS_PAGE_SIZE = config("POSTS_PAGE_SIZE", default=20, cast=int)
+POSTS_MAX_PAGE_SIZE = config("POSTS_MAX_PAGE_SIZE", default=100, cast=int)
+POSTS_BATCH_MAX_IDS = config("POSTS_BATCH_MAX_IDS", default=100, cast=int)
+
+# Bulk post ingestion
+POSTS_BULK_MAX_ITEMS = config("POSTS_BULK_MAX_ITEMS", default=5000, cast=int)
+POSTS_BULK_BATCH_SIZE = config("POSTS_BULK_BATCH_SIZE", default=500, cast=int)
+# Rows fetched per database round trip when streaming exports.
+POSTS_EXPORT_CHUNK_SIZE = config("POSTS_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Posts cache: entries are fresh for POSTS_CACHE_TTL seconds and then served
+# stale for up to POSTS_CACHE_GRACE more while a single worker rebuilds them.
+POSTS_CACHE_TTL = config("POSTS_CACHE_TTL", default=300, cast=int)
+POSTS_CACHE_GRACE = config("POSTS_CACHE_GRACE", default=60, cast=int)
+# How long a "post not found" answer is cached.
+POSTS_CACHE_NEGATIVE_TTL = config("POSTS_CACHE_NEGATIVE_TTL", default=30, cast=int)
+# Cache the final JSON body (optionally gzipped) instead of the serialized
+# data, so cache hits are returned without going through DRF rendering.
+POSTS_CACHE_RENDERED = config("POSTS_CACHE_RENDERED", default=False, cast=bool)
+POSTS_CACHE_GZIP = config("POSTS_CACHE_GZIP", default=False, cast=bool)
+POSTS_CACHE_GZIP_MIN_SIZE = config("POSTS_CACHE_GZIP_MIN_SIZE", default=1024, cast=int)
+# In-process LRU in front of Redis. Writes are announced over pub/sub
+# (POSTS_BROKER: "redis", or "local" for a single process) so other
+# workers drop their copy; POSTS_LOCAL_CACHE_TTL bounds any missed message.
+POSTS_LOCAL_CACHE_ENABLED = config("POSTS_LOCAL_CACHE_ENABLED", default=False, cast=bool)
+POSTS_LOCAL_CACHE_MAX_ENTRIES = config("POSTS_LOCAL_CACHE_MAX_ENTRIES", default=1000, cast=int)
+POSTS_LOCAL_CACHE_TTL = config("POSTS_LOCAL_CACHE_TTL", default=5, cast=int)
+POSTS_BROKER = config("POSTS_BROKER", default="redis")
+# Connection pool size of the redis.asyncio client used by posts.async_views.
+POSTS_ASYNC_REDIS_MAX_CONNECTIONS = config("POSTS_ASYNC_REDIS_MAX_CONNECTIONS", default=100, cast=int)
+POSTS_CACHE_LOCK_TIMEOUT = config("POSTS_CACHE_LOCK_TIMEOUT", default=5, cast=int)
+POSTS_CACHE_LOCK_WAIT = config("POSTS_CACHE_LOCK_WAIT", default=0.5, cast=float)
+
+# Per-process metrics (posts.metrics) and their Prometheus endpoint at
+# v1/api/posts/metrics. Off by default; nothing is recorded while off.
+POSTS_METRICS_ENABLED = config("POSTS_METRICS_ENABLED", default=False, cast=bool)
+
+# Post bodies of at least this many bytes are stored zlib-compressed.
+POSTS_CONTENT_COMPRESS_MIN_SIZE = config("POSTS_CONTENT_COMPRESS_MIN_SIZE", default=2048, cast=int)
+
+# Posts kept in the Redis ranking behind v1/api/posts/most-viewed; it is
+# trimmed to this size by every flush_post_views run.
+POSTS_VIEW_RANKING_SIZE = config("POSTS_VIEW_RANKING_SIZE", default=10000, cast=int)
+
+# Delta sync (v1/api/posts/changes): changes are only handed out once they
+# are this old, so late commits are not skipped, and deletes are
+# remembered this long (see prune_post_tombstones).
+POSTS_CHANGES_SETTLE_SECONDS = config("POSTS_CHANGES_SETTLE_SECONDS", default=2, cast=int)
+POSTS_TOMBSTONE_RETENTION_DAYS = config("POSTS_TOMBSTONE_RETENTION_DAYS", default=30, cast=int)
+
+# SSE stream of new posts (v1/api/posts/stream). Streams send a comment
+# every POSTS_STREAM_HEARTBEAT seconds and end after
+# POSTS_STREAM_MAX_SECONDS, when clients reconnect with Last-Event-ID;
+# a stream more than POSTS_STREAM_QUEUE_SIZE messages behind is closed.
+POSTS_STREAM_HEARTBEAT = config("POSTS_STREAM_HEARTBEAT", default=15, cast=float)
+POSTS_STREAM_MAX_SECONDS = config("POSTS_STREAM_MAX_SECONDS", default=300, cast=float)
+POSTS_STREAM_RETRY_MS = config("POSTS_STREAM_RETRY_MS", default=2000, cast=int)
+POSTS_STREAM_QUEUE_SIZE = config("POSTS_STREAM_QUEUE_SIZE", default=100, cast=int)
+POSTS_STREAM_REPLAY_MAX = config("POSTS_STREAM_REPLAY_MAX", default=100, cast=int)
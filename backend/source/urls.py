@@ -18,7 +18,7 @@ from django.conf.urls.static import static
 from django.urls import path,include
 from django.conf import settings
 
-from source.jwt_middleware import MyTokenObtainPairView
+from source.jwt_middleware import MyTokenObtainPairView, MyTokenRefreshView
 
 urlpatterns = [
     # path('grappelli/', include('grappelli.urls')),  # Grappelli URL
@@ -26,6 +26,7 @@ urlpatterns = [
     path("v1/accounts/",include('accounts.urls')),
     path("v1/",include('posts.urls')),
     path("v1/api/login/", MyTokenObtainPairView.as_view(), name="login"),
+    path("v1/api/token/refresh/", MyTokenRefreshView.as_view(), name="token-refresh"),
 ]
 
 if settings.DEBUG: